@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+
+import chess
+
+import metrics
+
+try:
+    import diskcache
+except ImportError:  # the in-memory layer still works without it
+    diskcache = None
+
+###############################################################################
+# Shared, depth-aware cache for engine analysis (get_info results)
+###############################################################################
+def position_key(fen):
+    """
+    Normalizes a FEN so transpositions and repeat visits share one entry.
+    The halfmove/fullmove counters are dropped and the en passant square is
+    only kept when a capture is actually possible (python-chess EPD rules).
+    """
+    return chess.Board(fen).epd()
+
+
+class AnalysisCache:
+    """
+    Two-level cache: an in-memory LRU in front of an optional on-disk store.
+    Each entry remembers the depth it was computed at, so a deeper result
+    answers any request for an equal or shallower depth. That is right for
+    evaluations and commentary, but not for choosing a move at a given
+    strength, so every analysis is also kept under its exact depth for
+    get(..., exact=True).
+    """
+
+    def __init__(self, max_entries=5000, directory=None):
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if directory and diskcache is not None:
+            self._disk = diskcache.Cache(directory)
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key, entry):
+        # Caller must hold the lock
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+        if self._disk is not None:
+            entry = self._disk.get(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+        return entry
+
+    def get(self, fen, depth, exact=False):
+        """
+        Returns a cached analysis searched at least `depth` deep (exactly
+        `depth` deep with exact=True), or None.
+        """
+        key = position_key(fen)
+        entry = self._lookup((key, depth) if exact else key)
+        if entry is not None and entry["depth"] >= depth:
+            self.hits += 1
+            metrics.cache_result("analysis", True)
+            return dict(entry["info"])
+        self.misses += 1
+        metrics.cache_result("analysis", False)
+        return None
+
+    def put(self, fen, depth, info):
+        """
+        Stores `info` under its exact depth, and as the position's analysis
+        unless a deeper one is already cached.
+        """
+        key = position_key(fen)
+        entry = {"depth": depth, "info": dict(info)}
+        keys = [(key, depth)]
+        current = self._lookup(key)
+        if current is None or current["depth"] <= depth:
+            keys.append(key)
+        with self._lock:
+            for k in keys:
+                self._remember(k, entry)
+        if self._disk is not None:
+            for k in keys:
+                self._disk.set(k, entry)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+        self.hits = self.misses = 0
+
+
+# One process-wide instance shared by functions.py and play_chess.py
+cache = AnalysisCache(
+    max_entries=int(os.environ.get("ANALYSIS_CACHE_SIZE", 5000)),
+    directory=os.environ.get("ANALYSIS_CACHE_DIR", ".cache/analysis"),
+)
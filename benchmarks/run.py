@@ -0,0 +1,227 @@
+"""
+Benchmarks for the tutor's hot paths, run offline against the stand-ins in
+stubs.py:
+
+    python benchmarks/run.py                     # run and compare to baseline.json
+    python benchmarks/run.py --update-baseline   # record a new baseline
+    python benchmarks/run.py --engine-latency 0.05 --llm-latency 0.3 --no-compare
+
+Each case reports ops/sec and p50/p95/p99 latency. A case whose p50 is more
+than --tolerance slower than the baseline fails the run (exit status 1).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Measure the code, not whatever a previous run left on disk: the on-disk
+# caches are switched off and the in-memory ones are cleared per case
+os.environ["ANALYSIS_CACHE_DIR"] = ""
+os.environ["LLM_CACHE_DIR"] = ""
+os.environ["LLM_CACHE_FAMILIES"] = ""
+# The stand-in LLM has no quota; the rate limiter would only measure itself
+os.environ["LLM_REQUESTS_PER_MINUTE"] = "0"
+
+import chess
+
+import board_render
+import chatbot
+import functions
+import move_features
+import opening_book
+import play_chess
+import puzzle_store
+import puzzles
+import simple_engine
+import stubs
+from analysis_cache import cache as analysis_cache
+from pv_store import store as pv_store
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Below this many milliseconds a p50 difference is timer noise, not a regression
+NOISE_FLOOR_MS = 0.05
+
+# Nodes per engine.builtin_search run
+BUILTIN_NODES = 2000
+
+ITALIAN = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"
+
+###############################################################################
+# Cases
+###############################################################################
+def clear_analysis():
+    analysis_cache.clear()
+    pv_store.clear()
+
+def play_turn():
+    """One play_chess turn as main() runs it, with the commentary written in full."""
+    board = chess.Board(ITALIAN)
+    depth = 12
+    turn = play_chess.TurnAnalysis(depth)
+    move = chess.Move.from_uci("g8f6")
+    user_board = board.copy()
+    user_text = play_chess.user_move_analysis(user_board, move, depth, info=turn.info(user_board))
+    board.push(move)
+    info = turn.info(board, exact=True)
+    ai_move = chess.Move.from_uci(info["bestmove"])
+    ai_board = board.copy()
+    board.push(ai_move)
+    ai_text = play_chess.ai_move_analysis(ai_board, ai_move, depth, info=info)
+    return user_text, ai_text
+
+def sample_puzzle():
+    store = puzzles.load_puzzles("Easy")
+    return puzzles.get_random_puzzle(store, (1200, 1600))
+
+def cases():
+    """(name, operation, per-iteration setup or None) for every benchmark."""
+    board = chess.Board(ITALIAN)
+    renderer = board_render.get_renderer()
+    # A fixed node budget, so nodes/sec = BUILTIN_NODES * ops/sec
+    builtin = simple_engine.SimpleEngine(node_limit=BUILTIN_NODES, time_limit=None)
+    return [
+        ("openings.find_exact", lambda: functions.find("Sicilian Defense"), None),
+        ("openings.find_fuzzy", lambda: functions.find("sicillian defence najdorf"), None),
+        ("move.type_of_move_and_eval",
+         lambda: play_chess.type_of_move_and_eval("f8c5", board, 12), clear_analysis),
+        ("move.describe_legal_moves", lambda: move_features.describe_moves(board), None),
+        ("move.for_the_game", lambda: functions.for_the_game("f8c5", ITALIAN), clear_analysis),
+        ("render.board_cached", lambda: play_chess.render_board(board), None),
+        ("render.board_cold", lambda: play_chess.render_board(board), renderer.clear),
+        ("puzzles.sample", sample_puzzle, None),
+        ("chatbot.fen_query", lambda: chatbot.handle_chess_query(f"FEN {ITALIAN}"), clear_analysis),
+        ("chatbot.opening_query", lambda: chatbot.handle_chess_query("Opening Sicilian Defense"), None),
+        ("chatbot.general_query", lambda: chatbot.handle_chess_query("how do pawns promote?"), None),
+        ("play.turn", play_turn, clear_analysis),
+        ("play.book_move", lambda: opening_book.book_move(board, 16), None),
+        ("engine.builtin_search", lambda: builtin.analyse(ITALIAN, 8), builtin.table.clear),
+    ]
+
+###############################################################################
+# Runner
+###############################################################################
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(operation, setup=None, min_time=1.0, min_runs=20, max_runs=100000, warmup=3):
+    for _ in range(warmup):
+        if setup:
+            setup()
+        operation()
+    timings = []
+    spent = 0.0
+    while len(timings) < max_runs and (spent < min_time or len(timings) < min_runs):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "ops_per_sec": len(timings) / spent if spent else float("inf"),
+        "p50_ms": 1000 * statistics.median(timings),
+        "p95_ms": 1000 * percentile(timings, 0.95),
+        "p99_ms": 1000 * percentile(timings, 0.99),
+    }
+
+def run_cases(prefixes, min_time):
+    results = {}
+    print(f"{'case':<28} {'ops/sec':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'runs':>7}")
+    for name, operation, setup in cases():
+        if prefixes and not any(name.startswith(prefix) for prefix in prefixes):
+            continue
+        result = measure(operation, setup, min_time=min_time)
+        results[name] = result
+        print(f"{name:<28} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>9.3f} "
+              f"{result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} {result['runs']:>7}", flush=True)
+    return results
+
+def compare(results, baseline, tolerance):
+    """Lines describing regressions against `baseline` (empty if none)."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        limit = previous["p50_ms"] * (1 + tolerance)
+        if result["p50_ms"] > limit and result["p50_ms"] - previous["p50_ms"] > NOISE_FLOOR_MS:
+            regressions.append(
+                f"{name}: p50 {result['p50_ms']:.3f} ms vs baseline {previous['p50_ms']:.3f} ms "
+                f"(+{100 * (result['p50_ms'] / previous['p50_ms'] - 1):.0f}%, allowed +{100 * tolerance:.0f}%)"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the chess tutor.")
+    parser.add_argument("cases", nargs="*", help="only run cases whose name starts with one of these")
+    parser.add_argument("--engine-latency", type=float, default=0.0, help="seconds per engine call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per LLM call")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to spend per case")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed p50 slowdown against the baseline (0.5 = +50%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--no-compare", action="store_true")
+    args = parser.parse_args(argv)
+
+    stubs.install(args.engine_latency, args.llm_latency)
+    with tempfile.TemporaryDirectory(prefix="chess-bench-") as workdir:
+        # A synthetic puzzle store, so the puzzle case never touches the network
+        puzzle_store.PACKAGE_DIR = workdir
+        puzzle_store.STORE_DIR = os.path.join(workdir, "PuzzleStore")
+        stubs.write_puzzle_csv(os.path.join(workdir, "easy.csv"))
+        # Indexes and clients are built once, as a warm server would have them
+        functions.initialize()
+        results = run_cases(args.cases, args.min_time)
+
+    config = {"engine_latency": args.engine_latency, "llm_latency": args.llm_latency}
+
+    if args.update_baseline:
+        recorded = {}
+        if args.cases and os.path.exists(args.baseline):
+            # Re-recording a few cases keeps the others' baseline
+            with open(args.baseline, encoding="utf-8") as f:
+                previous = json.load(f)
+            if previous.get("config") == config:
+                recorded = previous["results"]
+        recorded.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": recorded}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if args.no_compare:
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; record one with --update-baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"Baseline was recorded with {baseline.get('config')}, this run used {config}; "
+              "not comparing (use --no-compare or --update-baseline)")
+        return 1
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS against the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Deterministic offline stand-ins for stockfish.online and Groq, used by the
+benchmark suite. Both sleep for a configurable latency so network-bound
+paths can be measured without the network.
+"""
+import time
+from types import SimpleNamespace
+
+import chess
+
+import engines
+import llm
+from fake_uci_engine import material, principal_variation
+
+###############################################################################
+# Engine
+###############################################################################
+class StubEngine(engines.EngineBackend):
+    """
+    Answers like stockfish.online (same dict shape, depth capped at 16), but
+    plays the alphabetically first legal move and scores by material.
+    """
+
+    max_depth = 16
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def analyse(self, fen, depth):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        board = chess.Board(fen)
+        pv = principal_variation(board)
+        if not pv:
+            raise ValueError("API Error: no legal moves")
+        # material() is relative to the side to move; answers are White POV
+        score = material(board) if board.turn == chess.WHITE else -material(board)
+        return {
+            "bestmove": pv[0].uci(),
+            "ponder": pv[1].uci() if len(pv) > 1 else None,
+            "evaluation": score / 100,
+            "mate": None,
+            "continuation": " ".join(move.uci() for move in pv),
+        }
+
+###############################################################################
+# LLM
+###############################################################################
+COMMENTARY = (
+    "<think>The position is balanced; consider piece activity and king safety.</think>"
+    "This move develops a piece toward the centre and keeps options open. "
+    "It does not change the material balance, but it improves coordination "
+    "and prepares to castle, which is what the position asks for."
+)
+
+def _reply(messages):
+    system, user = messages[0]["content"], messages[1]["content"]
+    if "return `YES`" in system:
+        return "<think>Classifying.</think>YES"
+    if "spell" in system.lower():
+        return user
+    return COMMENTARY
+
+
+class _Completions:
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def create(self, messages, model, stream=False, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        text = _reply(messages)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+        return (SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 16]))])
+                for i in range(0, len(text), 16))
+
+
+class StubGroq:
+    """The slice of the Groq client the tutor uses: chat.completions.create."""
+
+    def __init__(self, latency=0.0):
+        self.chat = SimpleNamespace(completions=_Completions(latency))
+
+
+def install(engine_latency=0.0, llm_latency=0.0):
+    """Routes all engine and LLM traffic of this process to the stand-ins."""
+    engine = StubEngine(engine_latency)
+    engines.set_backend(engine)
+    client = StubGroq(llm_latency)
+    llm._client = client
+    return engine, client
+
+###############################################################################
+# Puzzles
+###############################################################################
+PUZZLE_HEADER = "PuzzleId,FEN,Moves,Rating,RatingDeviation,Popularity,NbPlays,Themes,GameUrl,OpeningTags"
+PUZZLE_ROW = ("{id},r6k/pp2r2p/4Rp1Q/3p4/8/1N1P2R1/PqP2bPP/7K b - - 0 24,f2g3 e6e7 b2b1 b3c1 b1c1 h6c1,"
+              "{rating},75,95,1000,crushing hangingPiece long middlegame,https://lichess.org/x,")
+
+def write_puzzle_csv(path, count=20000):
+    """Writes `count` copies of one real puzzle with ratings spread over 600..2600."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(PUZZLE_HEADER + "\n")
+        for i in range(count):
+            f.write(PUZZLE_ROW.format(id=f"p{i}", rating=600 + (i * 7919) % 2000) + "\n")
@@ -0,0 +1,144 @@
+import base64
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import chess
+import chess.svg
+
+import metrics
+
+###############################################################################
+# Board rendering shared by the play and puzzle pages
+#
+# Streamlit reruns a page on every interaction, mostly without the position
+# changing, so rendered boards are kept in an LRU cache keyed on everything
+# that affects the picture: (piece placement, orientation, last move, size).
+###############################################################################
+def compact_svg(svg):
+    """
+    Shrinks a chess.svg board without changing how it looks: the repeated
+    coordinate glyphs become <defs> that are <use>d at each edge, and the
+    <desc> text, CSS classes and duplicate xlink:href attributes are dropped.
+    """
+    svg = re.sub(r"<desc>.*?</desc>", "", svg, flags=re.DOTALL)
+    svg = re.sub(r' class="[^"]*"', "", svg)
+    svg = re.sub(r' xlink:href="[^"]*"', "", svg)
+    svg = svg.replace(' xmlns:xlink="http://www.w3.org/1999/xlink"', "")
+
+    glyphs = {}
+
+    def reuse(match):
+        transform, attrs, body = match.groups()
+        glyph_id = glyphs.setdefault((attrs, body), f"c{len(glyphs)}")
+        return f'<use href="#{glyph_id}" transform="{transform}"/>'
+
+    svg = re.sub(r'<g transform="([^"]*)"((?: [a-z-]+="[^"]*")*)>(<path d="[^"]*" />)</g>', reuse, svg)
+    if glyphs:
+        defs = "".join(f'<g id="{glyph_id}"{attrs}>{body}</g>' for (attrs, body), glyph_id in glyphs.items())
+        if "<defs>" in svg:
+            svg = svg.replace("<defs>", "<defs>" + defs, 1)
+        else:
+            start = svg.index(">") + 1
+            svg = svg[:start] + "<defs>" + defs + "</defs>" + svg[start:]
+    return svg.replace(" />", "/>")
+
+
+class BoardRenderer:
+    """
+    Renders boards to <img> tags with inline base64 SVG, caching the last
+    `max_entries` distinct pictures. With compact=True the SVG is passed
+    through compact_svg() before it is encoded.
+    """
+
+    def __init__(self, max_entries=256, compact=False):
+        self.max_entries = max_entries
+        self.compact = compact
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "render_seconds": 0.0, "bytes": 0}
+
+    def svg(self, board, flipped=False, lastmove=None, size=None):
+        svg = chess.svg.board(board=board, flipped=flipped, lastmove=lastmove, size=size)
+        return compact_svg(svg) if self.compact else svg
+
+    def html(self, board, flipped=False, lastmove=None, size=None, width=400):
+        """The board as an <img> tag `width` pixels wide."""
+        key = (board.board_fen(), flipped, lastmove, size, width)
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["bytes"] += len(html)
+        if html is not None:
+            metrics.cache_result("render", True)
+            metrics.RENDER_BYTES.observe(len(html))
+            return html
+
+        with metrics.span("render.board", compact=self.compact) as span:
+            b64 = base64.b64encode(self.svg(board, flipped, lastmove, size).encode("utf-8")).decode("utf-8")
+            html = f'<img src="data:image/svg+xml;base64,{b64}" width="{width}"/>'
+        elapsed = span["seconds"]
+        metrics.cache_result("render", False)
+        metrics.RENDER_SECONDS.observe(elapsed)
+        metrics.RENDER_BYTES.observe(len(html))
+
+        with self._lock:
+            self._cache[key] = html
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self._stats["misses"] += 1
+            self._stats["render_seconds"] += elapsed
+            self._stats["bytes"] += len(html)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        """
+        Cache hits and misses, the average render time of a miss and the
+        average size of a served frame (the <img> tag) in bytes.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        frames = stats["hits"] + stats["misses"]
+        return {
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "render_ms": 1000 * stats["render_seconds"] / stats["misses"] if stats["misses"] else None,
+            "bytes_per_frame": stats["bytes"] / frames if frames else None,
+        }
+
+###############################################################################
+# Configuration
+#
+#   BOARD_RENDER_CACHE_SIZE  distinct boards kept rendered (default 256)
+#   BOARD_RENDER_COMPACT     "1" to serve the smaller compact SVG
+###############################################################################
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_renderer():
+    """The process-wide BoardRenderer (configured from the environment)."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = BoardRenderer(
+                max_entries=int(os.environ.get("BOARD_RENDER_CACHE_SIZE", 256)),
+                compact=os.environ.get("BOARD_RENDER_COMPACT", "0").lower() in ("1", "true", "yes"),
+            )
+        return _renderer
+
+def board_html(board, flipped=False, lastmove=None, size=None, width=400):
+    return get_renderer().html(board, flipped, lastmove, size, width)
+
+def last_move(board):
+    """The move that led to `board`, for highlighting, or None."""
+    return board.peek() if board.move_stack else None
+
+def render_stats():
+    return get_renderer().stats()
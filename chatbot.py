@@ -2,30 +2,64 @@ import streamlit as st
 from streamlit_chat import message
 from streamlit.components.v1 import html
 import functions
+import query_router
 
 
 st.session_state.setdefault("past", [])
 st.session_state.setdefault("generated", [])
+st.session_state.setdefault("pending", None)
 
-def handle_chess_query(user_input):
-    """Processes the user query and determines the response type."""
+def with_prefix(prefix, response):
+    """Prepends `prefix` to a response that may be a string or a stream of chunks."""
+    if isinstance(response, str):
+        return prefix + response
+    def chunks():
+        yield prefix
+        yield from response
+    return chunks()
+
+def handle_chess_query(user_input, stream=False):
+    """
+    Processes the user query and determines the response type. With
+    stream=True the LLM-written answers come back as a generator of text
+    chunks instead of a finished string.
+    """
     usi=(user_input).strip()
     response = None
-    # Check if input is a FEN string (likely requesting a move)
-    re=functions.normal_llm(usi)
-    if re=="YES":
-        if usi.lower()[0]=='f':
-            response = functions.bm_w_exp(usi[4:].strip())
+    # Cheap local checks (valid FEN, opening index, chess vocabulary) decide
+    # most messages; only ambiguous ones go to the LLM classifier
+    route = query_router.route(usi)
+    if route.kind != "off_topic":
+        # Check if input is a FEN string (likely requesting a move)
+        if route.kind == "fen":
+            fen = route.payload
+            if fen is None:
+                return "That doesn't look like a valid FEN. Try **`FEN <position>`** with a full FEN string."
+            response = functions.bm_w_exp(fen, stream=stream)
+            opening = functions.identify_opening(fen)
+            if opening:
+                eco, name = opening
+                response = with_prefix(f"**Opening:** {name} ({eco})\n\n", response)
         # Check if the user is asking about a chess opening
-        elif usi.lower()[0]=='o':
-            opening_name = usi[8:].strip()
+        elif route.kind == "opening":
+            if route.path == "index":
+                opening_name = route.payload[1]
+                row = route.payload
+            else:
+                opening_name = route.payload
+                row = functions.find(opening_name)
             try:
-                eco, name, pgn = functions.find(opening_name)
-                response = functions.ch_comp_th(eco, name, pgn)
+                eco, name, pgn = row
+                response = functions.ch_comp_th(eco, name, pgn, stream=stream)
             except TypeError:
                 response = "Sorry, I couldn't find that opening in my database."
+                suggestions = functions.suggest_openings(opening_name, limit=3)
+                if suggestions:
+                    response += " Did you mean:\n" + "\n".join(
+                        f"- **{name}** ({eco})" for _, (eco, name, _) in suggestions
+                    )
         else:
-            response=functions.normal_llm_ans(usi)
+            response=functions.normal_llm_ans(usi, stream=stream)
 
     # Default: General chess response
     else:
@@ -39,12 +73,9 @@ def on_input_change():
     if not user_input:
         return
 
-    # Store user query
+    # Store user query; main() streams the answer in on this run
     st.session_state.past.append(user_input)
-
-    # Generate bot response
-    bot_response = handle_chess_query(user_input)
-    st.session_state.generated.append(bot_response)
+    st.session_state.pending = user_input
 
     # Clear input field
     st.session_state.user_input = ""
@@ -53,12 +84,15 @@ def on_btn_click():
     """Clears chat history."""
     st.session_state.past.clear()
     st.session_state.generated.clear()
+    st.session_state.pending = None
 def main():
     # Streamlit UI
     if "generated" not in st.session_state:
         st.session_state["generated"] = []
     if "past" not in st.session_state:
         st.session_state["past"] = []
+    if "pending" not in st.session_state:
+        st.session_state["pending"] = None
     st.title("♟️ The Chess Tutor - AI Chatbot")
 
     chat_placeholder = st.empty()
@@ -68,10 +102,39 @@ def main():
             message(st.session_state["past"][i], is_user=True, key=f"{i}_user")
             message(st.session_state["generated"][i], key=f"{i}_bot")
 
+        # Stream the answer to the newest question as the model writes it
+        if st.session_state.pending is not None:
+            query = st.session_state.pending
+            message(query, is_user=True, key=f"{len(st.session_state.generated)}_user")
+            # Clear the query even if answering it fails, or every rerun
+            # would send it again; an answer is always recorded so past and
+            # generated stay aligned
+            bot_response = None
+            try:
+                response = handle_chess_query(query, stream=True)
+                if isinstance(response, str):
+                    st.markdown(response)
+                    bot_response = response
+                else:
+                    bot_response = st.write_stream(response)
+            except Exception as e:
+                bot_response = f"Sorry, something went wrong answering that: {e}"
+            finally:
+                st.session_state.pending = None
+                if bot_response is None:
+                    bot_response = "Sorry, that answer was interrupted."
+                st.session_state.generated.append(bot_response)
+            st.rerun()
+
         st.button("Clear Chat", on_click=on_btn_click)
 
     # Input Field with Auto-Clear
     st.text_input("Ask me about Chess:", on_change=on_input_change, key="user_input")
 
+    # How messages were routed so far (anything but "llm" skipped the classifier)
+    stats = query_router.route_stats()
+    if stats:
+        st.sidebar.caption("Query routing: " + ", ".join(f"{path} {count}" for path, count in sorted(stats.items())))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,397 @@
+import os
+import shlex
+import threading
+
+import chess
+import chess.engine
+from dotenv import load_dotenv
+
+import http_client
+import metrics
+import service_client
+import simple_engine
+from analysis_cache import cache as analysis_cache
+from pv_store import store as pv_store
+
+###############################################################################
+# 1) Engine backends
+#
+# Every backend answers analyse(fen, depth) with the same dictionary the
+# stockfish.online integration always returned:
+#     {"bestmove": "b7b6", "ponder": "f3e5", "evaluation": 1.36, "mate": None,
+#      "continuation": "b7b6 f3e5 h7h6 ..."}
+# evaluation is in pawns and mate in moves, both from White's point of view.
+# ponder is the reply the engine expects to bestmove (None if it has none).
+###############################################################################
+class EngineBackend:
+    """Base class for anything that can analyse a FEN."""
+
+    # Deepest search the backend will run; requests above it are clamped
+    max_depth = None
+
+    def clamp_depth(self, depth):
+        if self.max_depth is not None:
+            return min(depth, self.max_depth)
+        return depth
+
+    def analyse(self, fen, depth):
+        raise NotImplementedError
+
+    def shared_cache(self, depth):
+        """Whether analyses at `depth` go through the shared analysis cache and PV store."""
+        return True
+
+    def close(self):
+        pass
+
+
+class RemoteBackend(EngineBackend):
+    """
+    The public stockfish.online REST API (depth is capped at 16). Requests go
+    through the shared pooled client in http_client.py, so they reuse
+    connections, retry transient errors and give up after `deadline` seconds.
+    """
+
+    url = "https://stockfish.online/api/s/v2.php"
+    max_depth = 16
+
+    def __init__(self, deadline=30, client=None):
+        self.deadline = deadline
+        self.client = client
+
+    def analyse(self, fen, depth):
+        params = {"fen": fen, "depth": self.clamp_depth(depth)}
+        client = self.client or http_client.get_client()
+        data = client.get_json(self.url, params=params, deadline=self.deadline)
+
+        if not data.get("success", False):
+            # If success is false, data["data"] might contain error info
+            raise ValueError(f"API Error: {data.get('data', 'Unknown error')}")
+
+        # Example response structure:
+        # {
+        #     "success": true,
+        #     "evaluation": 1.36,
+        #     "mate": null,
+        #     "bestmove": "bestmove b7b6 ponder f3e5",
+        #     "continuation": "b7b6 f3e5 h7h6 g5f6 f8f6 d2f3"
+        # }
+        bestmove_parts = data["bestmove"].split()   # ["bestmove", "b7b6", "ponder", "f3e5"]
+        return {
+            "bestmove": bestmove_parts[1],
+            "ponder": bestmove_parts[3] if len(bestmove_parts) > 3 else None,
+            "evaluation": data["evaluation"],
+            "mate": data["mate"],
+            "continuation": data.get("continuation"),
+        }
+
+
+class UCIPoolBackend(EngineBackend):
+    """
+    Keeps `pool_size` warm UCI engine processes (Stockfish or anything that
+    speaks UCI) and hands one out per analysis. Engines are started lazily on
+    first use, or up front with warm().
+    """
+
+    def __init__(self, command, pool_size=2, threads=1, hash_mb=64, max_depth=None):
+        self.command = command
+        self.pool_size = pool_size
+        self.options = {"Threads": threads, "Hash": hash_mb}
+        self.max_depth = max_depth
+        # Idle engines, and how many engines exist (idle or checked out);
+        # both are guarded by the condition, which is notified whenever an
+        # engine comes back or a slot frees up
+        self._idle = []
+        self._started = 0
+        self._available = threading.Condition()
+
+    def _spawn(self):
+        engine = chess.engine.SimpleEngine.popen_uci(self.command)
+        # Only send the options this engine actually advertises
+        engine.configure({name: value for name, value in self.options.items()
+                          if name in engine.options})
+        return engine
+
+    def _spawn_into_slot(self):
+        """_spawn() for a slot already counted in _started; the slot is freed if it fails."""
+        try:
+            return self._spawn()
+        except BaseException:
+            with self._available:
+                self._started -= 1
+                self._available.notify()
+            raise
+
+    def warm(self):
+        """Starts every engine in the pool so the first requests don't pay for it."""
+        while True:
+            with self._available:
+                if self._started >= self.pool_size:
+                    return
+                self._started += 1
+            self._release(self._spawn_into_slot())
+
+    def _acquire(self):
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._started < self.pool_size:
+                    self._started += 1
+                    break
+                self._available.wait()
+        return self._spawn_into_slot()
+
+    def _release(self, engine, healthy=True):
+        if not healthy:
+            # A crashed engine frees its slot; the next request spawns a fresh one
+            try:
+                engine.quit()
+            except Exception:
+                pass
+        with self._available:
+            if healthy:
+                self._idle.append(engine)
+            else:
+                self._started -= 1
+            self._available.notify()
+
+    def analyse(self, fen, depth):
+        board = chess.Board(fen)
+        engine = self._acquire()
+        healthy = False
+        try:
+            result = engine.analyse(board, chess.engine.Limit(depth=self.clamp_depth(depth)))
+            healthy = True
+        finally:
+            # Whatever went wrong, the slot goes back; an engine interrupted
+            # mid-search is replaced rather than reused
+            self._release(engine, healthy)
+
+        pv = result.get("pv") or []
+        if not pv:
+            raise ValueError("Engine returned no move for this position")
+        score = result["score"].white()
+        mate_val = score.mate()
+        return {
+            "bestmove": pv[0].uci(),
+            "ponder": pv[1].uci() if len(pv) > 1 else None,
+            "evaluation": None if mate_val is not None else score.score() / 100,
+            "mate": mate_val,
+            "continuation": " ".join(move.uci() for move in pv),
+        }
+
+    def close(self):
+        """
+        Quits the idle engines. Engines checked out right now keep their
+        slots and are returned to the pool as usual, so an analyse() running
+        concurrently never pushes the pool past pool_size.
+        """
+        with self._available:
+            engines, self._idle = self._idle, []
+            self._started -= len(engines)
+            self._available.notify_all()
+        for engine in engines:
+            try:
+                engine.quit()
+            except Exception:
+                pass
+
+class BuiltinBackend(EngineBackend):
+    """
+    The in-process alpha-beta search in simple_engine.py: no network and no
+    engine process, at the cost of playing strength. Meant for the low skill
+    levels, see TieredBackend.
+
+    Its results skip the shared caches: a search costs milliseconds, a
+    deeper cached analysis would play above the requested strength, and
+    with strength < 1 the move is a random pick, not the position's analysis.
+    """
+
+    def __init__(self, node_limit=20000, time_limit=1.0, strength=1.0, max_depth=None):
+        self.engine = simple_engine.SimpleEngine(node_limit=node_limit, time_limit=time_limit, strength=strength)
+        self.max_depth = max_depth
+
+    def analyse(self, fen, depth):
+        return self.engine.analyse(fen, self.clamp_depth(depth))
+
+    def shared_cache(self, depth):
+        return False
+
+
+class TieredBackend(EngineBackend):
+    """
+    Sends requests up to `local_depth` to `local` (the built-in engine) and
+    deeper ones to `backend`, so the shallow searches of the low skill levels
+    never pay a round trip.
+    """
+
+    def __init__(self, local, backend, local_depth):
+        self.local = local
+        self.backend = backend
+        self.local_depth = local_depth
+        self.max_depth = backend.max_depth
+
+    def _route(self, depth):
+        return self.local if depth <= self.local_depth else self.backend
+
+    def analyse(self, fen, depth):
+        return self._route(depth).analyse(fen, depth)
+
+    def shared_cache(self, depth):
+        return self._route(depth).shared_cache(depth)
+
+    def close(self):
+        self.local.close()
+        self.backend.close()
+
+###############################################################################
+# 2) Configuration
+#
+#   CHESS_ENGINE_BACKEND  "remote" (default), "uci" or "builtin"
+#   ENGINE_API_DEADLINE   seconds a remote analysis may take, retries included
+#   STOCKFISH_PATH        engine command for the uci backend
+#   ENGINE_POOL_SIZE      number of warm engine processes (default 2)
+#   ENGINE_THREADS        UCI "Threads" option per engine (default 1)
+#   ENGINE_HASH_MB        UCI "Hash" option per engine in MB (default 64)
+#   LOCAL_ENGINE_MAX_DEPTH  depths up to this go to the built-in engine
+#                           whatever the backend (default 4; 0 turns it off)
+#   LOCAL_ENGINE_NODES    node limit per built-in search (default 20000)
+#   LOCAL_ENGINE_TIME     seconds per built-in search (default 1.0)
+#   LOCAL_ENGINE_STRENGTH 0.0-1.0, how reliably the built-in engine plays its
+#                         best move (default 1.0)
+###############################################################################
+_backend = None
+_backend_lock = threading.Lock()
+
+def _builtin_from_env():
+    return BuiltinBackend(
+        node_limit=int(os.environ.get("LOCAL_ENGINE_NODES", 20000)),
+        time_limit=float(os.environ.get("LOCAL_ENGINE_TIME", 1.0)),
+        strength=float(os.environ.get("LOCAL_ENGINE_STRENGTH", 1.0)),
+    )
+
+def backend_from_env():
+    load_dotenv()
+    kind = os.environ.get("CHESS_ENGINE_BACKEND", "remote").lower()
+    if kind == "builtin":
+        return _builtin_from_env()
+    if kind == "remote":
+        backend = RemoteBackend(deadline=float(os.environ.get("ENGINE_API_DEADLINE", 30)))
+    elif kind == "uci":
+        command = shlex.split(os.environ.get("STOCKFISH_PATH", "stockfish"))
+        backend = UCIPoolBackend(
+            command,
+            pool_size=int(os.environ.get("ENGINE_POOL_SIZE", 2)),
+            threads=int(os.environ.get("ENGINE_THREADS", 1)),
+            hash_mb=int(os.environ.get("ENGINE_HASH_MB", 64)),
+        )
+    else:
+        raise ValueError(f"Unknown CHESS_ENGINE_BACKEND: {kind}")
+    local_depth = int(os.environ.get("LOCAL_ENGINE_MAX_DEPTH", 4))
+    if local_depth > 0:
+        return TieredBackend(_builtin_from_env(), backend, local_depth)
+    return backend
+
+def get_backend():
+    """Returns the process-wide engine backend, creating it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = backend_from_env()
+        return _backend
+
+def close_backend():
+    """Shuts down the process-wide backend's engines (entry points call this on exit)."""
+    if _backend is not None:
+        _backend.close()
+
+def _close_when_main_thread_exits():
+    # python-chess drives each engine from a non-daemon thread, and the
+    # interpreter waits for those before atexit hooks run. The main thread
+    # counts as finished before that wait, so this watcher can close the
+    # engines in time for any entry point that doesn't call close_backend().
+    threading.main_thread().join()
+    close_backend()
+
+threading.Thread(target=_close_when_main_thread_exits, name="engine-shutdown", daemon=True).start()
+
+def set_backend(backend):
+    """Swaps the process-wide backend (e.g. for a scripted fake engine)."""
+    global _backend
+    with _backend_lock:
+        old, _backend = _backend, backend
+    if old is not None and old is not backend:
+        old.close()
+
+###############################################################################
+# 3) Cached entry point used by functions.py and play_chess.py
+###############################################################################
+def get_info(fen, depth=15, min_depth=None, exact=False):
+    """
+    Analyses `fen` with the configured backend, going through the shared
+    analysis cache. Returns bestmove, ponder, evaluation, mate and continuation.
+
+    A cached deeper analysis answers a shallower request, which is what
+    evaluations want. Pass exact=True when the result picks a move at a
+    playing strength: only an analysis at exactly `depth` is reused then.
+
+    A position that lies on the PV of an earlier analysis is answered from
+    that line when the line still reaches `min_depth` there (by default a
+    couple of plies short of `depth`, see pv_store.py); only positions off
+    every stored line reach the engine.
+
+    With ANALYSIS_SERVICE_URL set the service answers instead, from its own
+    engine pool and caches (see service.py).
+    """
+    service = service_client.get_client()
+    if service is not None:
+        with metrics.span("engine.get_info", depth=depth, source="service") as span:
+            info = service.get_info(fen, depth, min_depth, exact)
+        metrics.ENGINE_SECONDS.labels("service").observe(span["seconds"])
+        return info
+    backend = get_backend()
+    depth = backend.clamp_depth(depth)
+    with metrics.span("engine.get_info", depth=depth) as span:
+        try:
+            info, span["source"] = _lookup_or_analyse(backend, fen, depth, min_depth, exact)
+        except Exception as e:
+            metrics.ENGINE_ERRORS.labels(type(e).__name__).inc()
+            raise
+    metrics.ENGINE_SECONDS.labels(span["source"]).observe(span["seconds"])
+    return info
+
+def _lookup_or_analyse(backend, fen, depth, min_depth, exact=False):
+    """(info, source) where source says which layer answered: local, cache, pv or engine."""
+    if not backend.shared_cache(depth):
+        return backend.analyse(fen, depth), "local"
+    cached = analysis_cache.get(fen, depth, exact)
+    if cached is not None:
+        return cached, "cache"
+    if min_depth is None:
+        min_depth = pv_store.min_depth(depth)
+    # A deeper line would play above the requested strength
+    reused = pv_store.get(fen, min_depth, depth if exact else None)
+    if reused is not None:
+        return reused, "pv"
+    info = backend.analyse(fen, depth)
+    analysis_cache.put(fen, depth, info)
+    pv_store.put(fen, depth, info)
+    return info, "engine"
+
+def iter_info(fens, depth=15, max_in_flight=4):
+    """
+    Analyses many FENs concurrently with at most `max_in_flight` requests
+    outstanding. Yields (fen, info, error) tuples as each analysis finishes.
+    """
+    return http_client.batch(lambda fen: get_info(fen, depth), fens, max_in_flight)
+
+def get_info_many(fens, depth=15, max_in_flight=4):
+    """Like get_info for a list of FENs; results come back in input order."""
+    fens = list(fens)
+    results = {}
+    for fen, info, error in iter_info(dict.fromkeys(fens), depth, max_in_flight):
+        if error is not None:
+            raise error
+        results[fen] = info
+    return [results[fen] for fen in fens]
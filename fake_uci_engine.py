@@ -0,0 +1,83 @@
+"""
+A tiny scripted UCI engine for exercising the "uci" engine backend without
+a real Stockfish binary:
+
+    CHESS_ENGINE_BACKEND=uci STOCKFISH_PATH="python fake_uci_engine.py"
+
+It always plays the alphabetically first legal move and scores positions by
+material only, so its answers are fully deterministic.
+"""
+import sys
+
+import chess
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 300,
+    chess.BISHOP: 300,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0,
+}
+
+def material(board):
+    score = 0
+    for piece in board.piece_map().values():
+        value = PIECE_VALUES[piece.piece_type]
+        score += value if piece.color == chess.WHITE else -value
+    # UCI scores are relative to the side to move
+    return score if board.turn == chess.WHITE else -score
+
+def principal_variation(board, length=3):
+    board = board.copy(stack=False)
+    pv = []
+    while len(pv) < length and not board.is_game_over():
+        move = min(board.legal_moves, key=lambda m: m.uci())
+        pv.append(move)
+        board.push(move)
+    return pv
+
+def reply(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+def main():
+    board = chess.Board()
+    for raw in sys.stdin:
+        tokens = raw.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == "uci":
+            reply("id name FakeUCI")
+            reply("id author Chess Tutor")
+            reply("option name Threads type spin default 1 min 1 max 512")
+            reply("option name Hash type spin default 16 min 1 max 33554432")
+            reply("uciok")
+        elif command == "isready":
+            reply("readyok")
+        elif command == "position":
+            if tokens[1] == "startpos":
+                board = chess.Board()
+                rest = tokens[2:]
+            else:
+                board = chess.Board(" ".join(tokens[2:8]))
+                rest = tokens[8:]
+            if rest and rest[0] == "moves":
+                for uci in rest[1:]:
+                    board.push_uci(uci)
+        elif command == "go":
+            depth = int(tokens[tokens.index("depth") + 1]) if "depth" in tokens else 1
+            pv = principal_variation(board)
+            if not pv:
+                reply("info depth 0 score mate 0" if board.is_checkmate() else "info depth 0 score cp 0")
+                reply("bestmove (none)")
+                continue
+            reply(f"info depth {depth} score cp {material(board)} pv {' '.join(m.uci() for m in pv)}")
+            ponder = f" ponder {pv[1].uci()}" if len(pv) > 1 else ""
+            reply(f"bestmove {pv[0].uci()}{ponder}")
+        elif command == "quit":
+            break
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import io
+import json
+import sys
+
+import chess
+import chess.pgn
+
+import engines
+
+###############################################################################
+# Whole-game review
+#
+# Every position of every game is analysed concurrently through
+# engines.iter_info (so at most `max_in_flight` analyses run at once and the
+# shared analysis cache is used), and each move is reviewed as soon as the
+# positions before and after it are both known. Scores are centipawns from
+# White's point of view; a move's loss is how much worse the position got
+# for the side that played it compared with the engine's evaluation before.
+###############################################################################
+INACCURACY_CP = 50
+MISTAKE_CP = 100
+BLUNDER_CP = 300
+# A forced mate counts as this many centipawns (less the moves it takes)
+MATE_CP = 10000
+
+def score_cp(info):
+    """White-POV centipawns of an engine analysis, mates included."""
+    if info["mate"] is not None:
+        sign = 1 if info["mate"] > 0 else -1
+        return sign * (MATE_CP - abs(info["mate"]))
+    return round(info["evaluation"] * 100)
+
+def terminal_score(board):
+    """Score of a finished game, or None if `board` still has moves to play."""
+    if board.is_checkmate():
+        # The side to move has been mated
+        return -MATE_CP if board.turn == chess.WHITE else MATE_CP
+    if board.is_game_over():
+        return 0
+    return None
+
+def classify(move_uci, best_move, loss):
+    if move_uci == best_move:
+        return "best"
+    if loss >= BLUNDER_CP:
+        return "blunder"
+    if loss >= MISTAKE_CP:
+        return "mistake"
+    if loss >= INACCURACY_CP:
+        return "inaccuracy"
+    return "good"
+
+def read_games(pgn):
+    """Yields the games of a PGN string or text file object (one or many games)."""
+    f = io.StringIO(pgn) if isinstance(pgn, str) else pgn
+    while True:
+        game = chess.pgn.read_game(f)
+        if game is None:
+            return
+        yield game
+
+def game_plies(game):
+    """(board before the move, move) for every move of the main line."""
+    board = game.board()
+    plies = []
+    for move in game.mainline_moves():
+        plies.append((board.copy(stack=False), move))
+        board.push(move)
+    return plies
+
+
+class _Ply:
+    """One move waiting for the analyses of the positions around it."""
+
+    def __init__(self, game_index, ply, board, move):
+        self.game_index = game_index
+        self.ply = ply
+        self.move = move
+        self.white = board.turn == chess.WHITE
+        self.san = board.san(move)
+        self.fen = board.fen()
+        after = board.copy(stack=False)
+        after.push(move)
+        self.after_fen = after.fen()
+        self.before = None          # engine analysis of the position before
+        self.after = terminal_score(after)
+        self.error = None
+        self.reported = False
+
+    def ready(self):
+        if self.reported:
+            return False
+        return self.error is not None or (self.before is not None and self.after is not None)
+
+    def result(self):
+        result = {
+            "game": self.game_index,
+            "ply": self.ply,
+            "side": "white" if self.white else "black",
+            "move": self.move.uci(),
+            "san": self.san,
+            "fen": self.fen,
+        }
+        if self.error is not None:
+            result.update({"best": None, "eval_before": None, "eval_after": None,
+                           "loss": None, "classification": None, "error": str(self.error)})
+            return result
+        before = score_cp(self.before)
+        # Only a move that makes things worse for its own side loses anything
+        loss = max(0, (before - self.after) if self.white else (self.after - before))
+        result.update({
+            "best": self.before["bestmove"],
+            "eval_before": before,
+            "eval_after": self.after,
+            "loss": loss,
+            "classification": classify(self.move.uci(), self.before["bestmove"], loss),
+            "error": None,
+        })
+        return result
+
+
+def review_games(games, depth=12, max_in_flight=4):
+    """
+    Reviews every move of `games` (chess.pgn.Game objects) and yields one
+    result dict per move as soon as it is known, so results arrive in
+    completion order rather than move order. Each dict holds game (index),
+    ply, side, move, san, fen, best, eval_before, eval_after, loss,
+    classification and error.
+    """
+    waiting_before = {}             # fen -> plies needing it as their "before"
+    waiting_after = {}              # fen -> plies needing it as their "after"
+    for game_index, game in enumerate(games):
+        for ply, (board, move) in enumerate(game_plies(game), start=1):
+            pending = _Ply(game_index, ply, board, move)
+            waiting_before.setdefault(pending.fen, []).append(pending)
+            if pending.after is None:
+                waiting_after.setdefault(pending.after_fen, []).append(pending)
+
+    fens = list(dict.fromkeys(list(waiting_before) + list(waiting_after)))
+    for fen, info, error in engines.iter_info(fens, depth, max_in_flight):
+        touched = []
+        for pending in waiting_before.pop(fen, []):
+            if error is not None:
+                pending.error = error
+            else:
+                pending.before = info
+            touched.append(pending)
+        for pending in waiting_after.pop(fen, []):
+            if error is not None:
+                pending.error = error
+            else:
+                pending.after = score_cp(info)
+            touched.append(pending)
+        for pending in touched:
+            # A failed analysis settles a ply before its other position arrives
+            if pending.ready():
+                pending.reported = True
+                yield pending.result()
+
+def review_pgn(pgn, depth=12, max_in_flight=4):
+    """review_games() for a PGN string or file object with one or more games."""
+    return review_games(read_games(pgn), depth, max_in_flight)
+
+def summarize(results):
+    """
+    Per game and side: how many moves fell in each class and the average
+    loss, e.g. {0: {"white": {"best": 12, ..., "average_loss": 31.5}, ...}}.
+    """
+    summary = {}
+    for result in results:
+        if result["classification"] is None:
+            continue
+        stats = summary.setdefault(result["game"], {}).setdefault(
+            result["side"], {"moves": 0, "total_loss": 0})
+        stats[result["classification"]] = stats.get(result["classification"], 0) + 1
+        stats["moves"] += 1
+        stats["total_loss"] += result["loss"]
+    for sides in summary.values():
+        for stats in sides.values():
+            stats["average_loss"] = stats.pop("total_loss") / stats["moves"]
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Review every move of one or more PGN games.")
+    parser.add_argument("pgn", help="PGN file (one or many games), or - for stdin")
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--jobs", type=int, default=4, help="analyses in flight at once")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per move")
+    args = parser.parse_args(argv)
+
+    f = sys.stdin if args.pgn == "-" else open(args.pgn, encoding="utf-8")
+    with f:
+        results = []
+        for result in review_pgn(f, args.depth, args.jobs):
+            results.append(result)
+            if args.json:
+                print(json.dumps(result), flush=True)
+            elif result["error"] is not None:
+                print(f"game {result['game'] + 1} ply {result['ply']:>3} {result['san']:<8} "
+                      f"analysis failed: {result['error']}", flush=True)
+            else:
+                print(f"game {result['game'] + 1} ply {result['ply']:>3} {result['san']:<8} "
+                      f"{result['classification']:<10} loss {result['loss']:>5} "
+                      f"(best {result['best']})", flush=True)
+
+    if not args.json:
+        for game_index, sides in sorted(summarize(results).items()):
+            for side, stats in sides.items():
+                counts = ", ".join(f"{stats.get(name, 0)} {name}" for name in
+                                   ("best", "good", "inaccuracy", "mistake", "blunder"))
+                print(f"game {game_index + 1} {side}: {counts}; "
+                      f"average loss {stats['average_loss']:.0f} cp")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+###############################################################################
+# Shared HTTP client for remote APIs (stockfish.online and friends)
+#
+# - one keep-alive connection pool per process
+# - every call has a deadline covering all of its retries
+# - transient failures are retried with jittered exponential backoff
+# - a circuit breaker fails fast while the remote side is down
+###############################################################################
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a remote that has been failing repeatedly."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds. After that a single trial call is let through:
+    success closes the circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class HTTPClient:
+    def __init__(self, pool_size=16, timeout=10, deadline=30, retries=3,
+                 backoff=0.5, breaker=None):
+        self.timeout = timeout        # per attempt, in seconds
+        self.deadline = deadline      # per call, across all retries
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _sleep_before_retry(self, attempt, remaining):
+        # "Full jitter": a random wait up to the exponential backoff step
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        if delay >= remaining:
+            return False
+        time.sleep(delay)
+        return True
+
+    def get_json(self, url, params=None, deadline=None):
+        """
+        GETs `url` and returns the decoded JSON body. Raises CircuitOpenError
+        when the breaker is open, and the last error once retries or the
+        deadline are exhausted.
+        """
+        return self._request_json("GET", url, deadline, params=params)
+
+    def post_json(self, url, payload, deadline=None):
+        """POSTs `payload` as JSON to `url`; otherwise like get_json()."""
+        return self._request_json("POST", url, deadline, json=payload)
+
+    def _request_json(self, method, url, deadline=None, **kwargs):
+        deadline = self.deadline if deadline is None else deadline
+        stop_at = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {url}, not calling it")
+            remaining = stop_at - time.monotonic()
+            try:
+                response = self.session.request(
+                    method, url, timeout=min(self.timeout, max(remaining, 0.1)), **kwargs
+                )
+                if response.status_code in TRANSIENT_STATUS:
+                    raise requests.HTTPError(
+                        f"{response.status_code} from {url}", response=response
+                    )
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as error:
+                # Includes a 200 whose body isn't JSON (an HTML error page),
+                # which has no response attached and counts as a failure
+                status = getattr(getattr(error, "response", None), "status_code", None)
+                transient = status is None or status in TRANSIENT_STATUS
+                if not transient:
+                    # The remote answered, it just refused this request
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                remaining = stop_at - time.monotonic()
+                if attempt >= self.retries or not self._sleep_before_retry(attempt, remaining):
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                # Anything else still has to settle a half-open trial, or
+                # the breaker would reject every later call
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return data
+
+    def close(self):
+        self.session.close()
+
+
+def batch(func, items, max_in_flight=4):
+    """
+    Calls func(item) for every item with at most `max_in_flight` calls running
+    at once. Yields (item, result, error) tuples in completion order; exactly
+    one of result/error is None.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = {}
+
+        def submit_next():
+            for item in items:
+                pending[pool.submit(func, item)] = item
+                return True
+            return False
+
+        for _ in range(max_in_flight):
+            if not submit_next():
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, (None if error else future.result()), error
+                submit_next()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide HTTP client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
@@ -0,0 +1,353 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from dotenv import load_dotenv
+
+import llm_cache
+import llm_gateway
+import metrics
+import service_client
+
+DEFAULT_MODEL = "deepseek-r1-distill-llama-70b"
+FAST_MODEL = "llama-3.1-8b-instant"
+
+###############################################################################
+# Process-wide Groq client shared by functions.py and play_chess.py
+###############################################################################
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Returns the shared Groq client, creating it on first use. Raises if the
+    client cannot be built (e.g. GROQ_API_KEY is missing).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            load_dotenv()
+            # Imported here so pages that never call the LLM don't pay for it
+            from groq import Groq
+            # Retries are the gateway's job (with the rate limiter in the loop)
+            _client = Groq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=0)
+        return _client
+
+_gateway = None
+
+def get_gateway():
+    """
+    The process-wide LLMGateway every request goes through (rate limits,
+    retries, coalescing; configured from the environment).
+    """
+    global _gateway
+    with _client_lock:
+        if _gateway is None:
+            load_dotenv()
+            _gateway = llm_gateway.gateway_from_env(get_client)
+        return _gateway
+
+###############################################################################
+# Per-family model routing
+#
+# Each prompt family gets a model, an output cap and a latency budget (the
+# timeout of each attempt, in seconds). YES/NO classification and spell
+# checking go to a small non-reasoning model with a tight cap; the 70B
+# reasoning model is kept for the teaching explanations.
+###############################################################################
+ModelRoute = namedtuple("ModelRoute", "model max_tokens budget")
+
+_routes = None
+
+def get_routes():
+    """
+    {family: ModelRoute}, with a "default" entry for families not listed.
+    LLM_MODEL and LLM_FAST_MODEL override the two model names.
+    """
+    global _routes
+    with _client_lock:
+        if _routes is None:
+            load_dotenv()
+            model = os.environ.get("LLM_MODEL", DEFAULT_MODEL)
+            fast = os.environ.get("LLM_FAST_MODEL", FAST_MODEL)
+            _routes = {
+                "chess_check": ModelRoute(fast, max_tokens=4, budget=5),
+                "fen_check": ModelRoute(fast, max_tokens=4, budget=5),
+                "spell_check": ModelRoute(fast, max_tokens=200, budget=10),
+                "default": ModelRoute(model, max_tokens=None, budget=60),
+            }
+        return _routes
+
+def route(family, model=None):
+    """The ModelRoute for `family`; `model` replaces the routed model if given."""
+    routes = get_routes()
+    chosen = routes.get(family, routes["default"])
+    return chosen._replace(model=model) if model else chosen
+
+def _request_params(chosen):
+    params = {"timeout": chosen.budget}
+    if chosen.max_tokens:
+        params["max_tokens"] = chosen.max_tokens
+    return params
+
+###############################################################################
+# Per-family latency and token stats (uncached requests only)
+###############################################################################
+class FamilyStats:
+    """Calls, latency percentiles over the last `window` calls, and tokens per family."""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def record(self, family, model, seconds, usage=None, budget=None):
+        counts = metrics.token_counts(usage)
+        with self._lock:
+            stats = self._families.setdefault(family, {
+                "model": model, "calls": 0, "over_budget": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "latencies": deque(maxlen=self.window),
+            })
+            stats["model"] = model
+            stats["calls"] += 1
+            stats["latencies"].append(seconds)
+            if budget is not None and seconds > budget:
+                stats["over_budget"] += 1
+            for name, count in counts.items():
+                stats[name] += count
+
+    def snapshot(self):
+        """
+        {family: {model, calls, p50_ms, p95_ms, over_budget, prompt_tokens,
+        completion_tokens, completion_tokens_per_call}}.
+        """
+        with self._lock:
+            families = {family: dict(stats, latencies=sorted(stats["latencies"]))
+                        for family, stats in self._families.items()}
+        for stats in families.values():
+            latencies = stats.pop("latencies")
+            stats["p50_ms"] = 1000 * latencies[len(latencies) // 2]
+            stats["p95_ms"] = 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            stats["completion_tokens_per_call"] = stats["completion_tokens"] / stats["calls"]
+        return families
+
+    def clear(self):
+        with self._lock:
+            self._families.clear()
+
+family_stats = FamilyStats()
+
+###############################################################################
+# Completions
+###############################################################################
+_cache = None
+
+def get_cache():
+    """The process-wide LLM response cache (configured from the environment)."""
+    global _cache
+    with _client_lock:
+        if _cache is None:
+            load_dotenv()
+            _cache = llm_cache.cache_from_env()
+        return _cache
+
+def messages_for(system, user):
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+def complete(family, system, user, model=None):
+    """
+    Sends one system + user prompt to the model and returns the raw message
+    content (including any <think> block). `family` names the kind of prompt,
+    e.g. "theory" or "user_move", and picks the model (see route()); families
+    that opt in to caching are served from the response cache when the exact
+    same prompt was answered before.
+    """
+    service = service_client.get_client()
+    if service is not None:
+        # The service routes, caches and rate-limits for every worker
+        with metrics.span("llm.complete", family=family, source="service"):
+            return service.complete(family, system, user, model)
+    chosen = route(family, model)
+    model = chosen.model
+    cache = get_cache()
+    with metrics.span("llm.complete", family=family, model=model) as span:
+        text = cache.get(family, model, system, user)
+        span["cached"] = text is not None
+        if text is None:
+            try:
+                completion = get_gateway().complete(
+                    model, messages_for(system, user), family, **_request_params(chosen))
+            except Exception as e:
+                metrics.LLM_ERRORS.labels(family, model, type(e).__name__).inc()
+                raise
+            text = completion.text
+            span.update(metrics.token_counts(completion.usage))
+            cache.put(family, model, system, user, text)
+    if not span["cached"]:
+        metrics.LLM_SECONDS.labels(family, model).observe(span["seconds"])
+        family_stats.record(family, model, span["seconds"], completion.usage, chosen.budget)
+    return text
+
+async def acomplete(family, system, user, model=None):
+    """
+    complete() for asyncio code: awaiting several at once, e.g. with
+    asyncio.gather, sends them concurrently within the gateway's limits.
+    """
+    service = service_client.get_client()
+    if service is not None:
+        return await asyncio.to_thread(service.complete, family, system, user, model)
+    chosen = route(family, model)
+    model = chosen.model
+    cache = get_cache()
+    text = cache.get(family, model, system, user)
+    if text is not None:
+        return text
+    started = time.perf_counter()
+    try:
+        completion = await get_gateway().acomplete(
+            model, messages_for(system, user), family, **_request_params(chosen))
+    except Exception as e:
+        metrics.LLM_ERRORS.labels(family, model, type(e).__name__).inc()
+        raise
+    seconds = time.perf_counter() - started
+    metrics.LLM_SECONDS.labels(family, model).observe(seconds)
+    family_stats.record(family, model, seconds, completion.usage, chosen.budget)
+    cache.put(family, model, system, user, completion.text)
+    return completion.text
+
+def complete_all(requests, model=None):
+    """
+    complete() for several (family, system, user) requests at once, from
+    synchronous code such as a Streamlit page. Returns the texts in order;
+    a failed request gives its exception instead of a text.
+    """
+    async def gather():
+        return await asyncio.gather(
+            *(acomplete(family, system, user, model) for family, system, user in requests),
+            return_exceptions=True,
+        )
+    return asyncio.run(gather())
+
+def stream(family, system, user, model=None):
+    """
+    Like complete(), but yields the raw content in chunks as the model
+    produces it. A cached response is yielded as a single chunk, and a
+    finished stream is stored in the cache like a normal completion.
+    """
+    service = service_client.get_client()
+    if service is not None:
+        yield from service.stream(family, system, user, model)
+        return
+    chosen = route(family, model)
+    model = chosen.model
+    cache = get_cache()
+    cached = cache.get(family, model, system, user)
+    if cached is not None:
+        yield cached
+        return
+    with metrics.span("llm.stream", family=family, model=model) as span:
+        chunks = []
+        started = time.perf_counter()
+        try:
+            shared = get_gateway().stream(model, messages_for(system, user), family, **_request_params(chosen))
+            for delta in shared:
+                if not chunks:
+                    span["first_token"] = time.perf_counter() - started
+                    metrics.LLM_TTFT.labels(family, model).observe(span["first_token"])
+                chunks.append(delta)
+                yield delta
+        except Exception as e:
+            metrics.LLM_ERRORS.labels(family, model, type(e).__name__).inc()
+            raise
+        span.update(metrics.token_counts(shared.usage))
+        cache.put(family, model, system, user, "".join(chunks))
+    metrics.LLM_SECONDS.labels(family, model).observe(span["seconds"])
+    family_stats.record(family, model, span["seconds"], shared.usage, chosen.budget)
+
+def stream_visible(family, system, user, model=None):
+    """stream() with <think> blocks and leading whitespace removed on the fly."""
+    think = ThinkFilter()
+    for chunk in stream(family, system, user, model):
+        text = think.feed(chunk)
+        if text:
+            yield text
+    tail = think.flush()
+    if tail:
+        yield tail
+
+###############################################################################
+# Incremental <think>...</think> removal
+###############################################################################
+class ThinkFilter:
+    """
+    Streaming counterpart of clean(): feed() it chunks in order and it returns
+    the text that is safe to show so far. Tags split across chunks (e.g.
+    "<thi" + "nk>") are handled by holding back a possible partial tag until
+    the next chunk arrives.
+    """
+
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+        self._started = False   # any visible non-whitespace emitted yet
+
+    @staticmethod
+    def _partial_tag(text, tag):
+        # Length of the longest suffix of `text` that could start `tag`
+        for size in range(min(len(text), len(tag) - 1), 0, -1):
+            if tag.startswith(text[-size:]):
+                return size
+        return 0
+
+    def _emit(self, text):
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        out = []
+        while self._buffer:
+            if self._inside:
+                end = self._buffer.find(self.CLOSE)
+                if end < 0:
+                    # Only the tail can still turn into the closing tag
+                    self._buffer = self._buffer[-(len(self.CLOSE) - 1):]
+                    break
+                self._buffer = self._buffer[end + len(self.CLOSE):]
+                self._inside = False
+            else:
+                start = self._buffer.find(self.OPEN)
+                if start >= 0:
+                    out.append(self._buffer[:start])
+                    self._buffer = self._buffer[start + len(self.OPEN):]
+                    self._inside = True
+                    continue
+                held = self._partial_tag(self._buffer, self.OPEN)
+                out.append(self._buffer[:len(self._buffer) - held])
+                self._buffer = self._buffer[len(self._buffer) - held:]
+                break
+        return self._emit("".join(out))
+
+    def flush(self):
+        """Whatever visible text is still held back once the stream has ended."""
+        text = "" if self._inside else self._buffer
+        self._buffer = ""
+        return self._emit(text)
+
+def cache_stats():
+    """Per-family hit/miss counters of the response cache."""
+    return get_cache().stats()
+
+def gateway_stats():
+    """Requests sent, coalesced and retried by the gateway, and time spent throttled."""
+    return get_gateway().stats()
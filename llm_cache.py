@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import diskcache
+except ImportError:  # falls back to the in-memory layer only
+    diskcache = None
+
+import metrics
+
+###############################################################################
+# Content-addressed cache for LLM responses
+#
+# The key is a hash of (model, system prompt, user prompt), so the exact same
+# request from any user or session is answered from the cache. Only prompt
+# families that opt in are cached; free-form questions are not by default.
+###############################################################################
+DEFAULT_FAMILIES = "chess_check,fen_check,spell_check,best_move,theory,user_move,ai_move"
+
+def prompt_key(model, system, user):
+    payload = json.dumps([model, system, user], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    In-memory LRU (max_entries) in front of an on-disk diskcache store that
+    evicts least-recently-used entries beyond size_limit bytes. Entries
+    expire after `ttl` seconds when a ttl is given.
+    """
+
+    def __init__(self, families, directory=None, size_limit=64 * 2**20,
+                 max_entries=1000, ttl=None):
+        self.families = set(families)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if directory and diskcache is not None:
+            self._disk = diskcache.Cache(
+                directory, size_limit=size_limit,
+                eviction_policy="least-recently-used",
+            )
+        self._stats = {}
+
+    def enabled(self, family):
+        return family in self.families
+
+    def _count(self, family, outcome):
+        with self._lock:
+            counts = self._stats.setdefault(family, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get(self, family, model, system, user):
+        """The cached response for this exact prompt, or None."""
+        if not self.enabled(family):
+            return None
+        key = prompt_key(model, system, user)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None and self.ttl is not None and entry[1] < time.time():
+            entry = None
+        if entry is None and self._disk is not None:
+            text = self._disk.get(key)
+            if text is not None:
+                # The disk layer enforces the ttl itself; keep the memory copy in step
+                entry = (text, time.time() + self.ttl if self.ttl else None)
+                self._remember(key, entry)
+        self._count(family, "misses" if entry is None else "hits")
+        metrics.cache_result("llm", entry is not None)
+        return None if entry is None else entry[0]
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, family, model, system, user, text):
+        if not self.enabled(family):
+            return
+        key = prompt_key(model, system, user)
+        self._remember(key, (text, time.time() + self.ttl if self.ttl else None))
+        if self._disk is not None:
+            self._disk.set(key, text, expire=self.ttl)
+
+    def stats(self):
+        """{family: {"hits": n, "misses": n}} since the process started."""
+        with self._lock:
+            return {family: dict(counts) for family, counts in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._stats.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+###############################################################################
+# Configuration
+#
+#   LLM_CACHE_FAMILIES   comma separated prompt families to cache
+#   LLM_CACHE_DIR        on-disk location (empty disables the disk layer)
+#   LLM_CACHE_SIZE_MB    disk budget before LRU eviction (default 64)
+#   LLM_CACHE_TTL        seconds before an entry expires (default: never)
+###############################################################################
+def cache_from_env():
+    families = os.environ.get("LLM_CACHE_FAMILIES", DEFAULT_FAMILIES)
+    ttl = os.environ.get("LLM_CACHE_TTL")
+    return ResponseCache(
+        families=[family.strip() for family in families.split(",") if family.strip()],
+        directory=os.environ.get("LLM_CACHE_DIR", ".cache/llm"),
+        size_limit=int(float(os.environ.get("LLM_CACHE_SIZE_MB", 64)) * 2**20),
+        ttl=float(ttl) if ttl else None,
+    )
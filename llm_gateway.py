@@ -0,0 +1,317 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+from http_client import TRANSIENT_STATUS
+
+###############################################################################
+# Process-wide gateway for every Groq request
+#
+# - a token bucket per quota (requests and, optionally, tokens per minute)
+#   holds requests back before Groq has to reject them
+# - at most `max_concurrency` requests are on the wire at once
+# - 429/5xx and connection errors are retried with jittered exponential
+#   backoff, honouring Retry-After when Groq sends it
+# - identical requests already in flight are not sent again: later callers
+#   wait on the first caller's future (or read the same stream)
+###############################################################################
+Completion = namedtuple("Completion", "text usage")
+
+
+class TokenBucket:
+    """
+    Allows `rate` units per second on average with bursts of up to
+    `capacity`. acquire() blocks until enough units are available; charge()
+    takes units after the fact, so an overrun delays the callers after it.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, quota):
+        return cls(quota / 60, quota)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """Takes `amount` units, waiting as long as needed. Returns the seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return waited
+                delay = (amount - self._level) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def charge(self, amount):
+        with self._lock:
+            self._refill()
+            self._level -= amount
+
+
+def is_transient(error):
+    """True for errors worth retrying: 429, 5xx, connection problems and timeouts."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in TRANSIENT_STATUS
+    # groq.APIConnectionError and groq.APITimeoutError carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+def retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header), or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def estimate_tokens(messages):
+    # Roughly four characters per token for English prompts
+    return sum(len(message["content"]) for message in messages) // 4 + 1
+
+
+class SharedStream:
+    """
+    The chunks of one streamed completion as they arrive. Any number of
+    callers can iterate it, each from the first chunk, while it is still
+    being written; `usage` is set once Groq reports it.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.usage = None
+        self.done = False
+        self.error = None
+        self._changed = threading.Condition()
+
+    def append(self, chunk):
+        with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    def finish(self, error=None):
+        with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._changed:
+                while index >= len(self.chunks) and not self.done:
+                    self._changed.wait()
+                if index >= len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+                new = self.chunks[index:]
+            index += len(new)
+            yield from new
+
+
+class LLMGateway:
+    """
+    Sends chat completions through `get_client()` (a Groq client or anything
+    with the same chat.completions.create) within the configured quota.
+    `family` arguments only label metrics; they are not part of the request.
+    """
+
+    def __init__(self, get_client, requests_per_minute=30, tokens_per_minute=None,
+                 max_concurrency=4, retries=3, backoff=1.0):
+        self.get_client = get_client
+        self.requests = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket.per_minute(tokens_per_minute) if tokens_per_minute else None
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Runs submit() and stream() requests; the slots still bound what is on the wire
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "coalesced": 0, "retries": 0, "throttled_seconds": 0.0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        """Requests sent, coalesced and retried, and seconds spent waiting for quota."""
+        with self._lock:
+            return dict(self._stats)
+
+    # -- Sending one request -------------------------------------------------
+    def _throttle(self, messages):
+        waited = 0.0
+        if self.requests is not None:
+            waited += self.requests.acquire()
+        if self.tokens is not None:
+            waited += self.tokens.acquire(estimate_tokens(messages))
+        if waited:
+            self._count("throttled_seconds", waited)
+            metrics.LLM_THROTTLE_SECONDS.observe(waited)
+
+    def _charge_usage(self, family, model, messages, usage):
+        metrics.record_tokens(family, model, usage)
+        if self.tokens is not None and usage is not None:
+            # The bucket was charged the prompt estimate; settle the difference
+            used = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+            self.tokens.charge(used - estimate_tokens(messages))
+
+    def _send(self, model, messages, attempt, can_retry=lambda: True):
+        """Runs attempt() within the quota, retrying transient failures."""
+        retries = 0
+        while True:
+            self._throttle(messages)
+            self._count("requests")
+            try:
+                with self._slots:
+                    return attempt()
+            except Exception as error:
+                if not is_transient(error) or retries >= self.retries or not can_retry():
+                    raise
+                delay = retry_after(error)
+                if delay is None:
+                    # "Full jitter", as in http_client
+                    delay = random.uniform(0, self.backoff * (2 ** retries))
+                self._count("retries")
+                metrics.LLM_RETRIES.labels(model, str(getattr(error, "status_code", None) or type(error).__name__)).inc()
+                time.sleep(delay)
+                retries += 1
+
+    def _complete(self, family, model, messages, params):
+        def attempt():
+            return self.get_client().chat.completions.create(messages=messages, model=model, **params)
+
+        chat_completion = self._send(model, messages, attempt)
+        usage = getattr(chat_completion, "usage", None)
+        self._charge_usage(family, model, messages, usage)
+        return Completion(chat_completion.choices[0].message.content, usage)
+
+    def _stream(self, family, model, messages, params, shared):
+        def attempt():
+            events = self.get_client().chat.completions.create(
+                messages=messages, model=model, stream=True, **params)
+            for event in events:
+                delta = event.choices[0].delta.content if event.choices else None
+                if delta:
+                    shared.append(delta)
+                # Groq reports usage on the final chunk of a stream
+                usage = getattr(getattr(event, "x_groq", None), "usage", None)
+                if usage is not None:
+                    shared.usage = usage
+
+        try:
+            # Once text has been handed out a retry would repeat it
+            self._send(model, messages, attempt, can_retry=lambda: not shared.chunks)
+        except Exception as error:
+            shared.finish(error)
+            return
+        self._charge_usage(family, model, messages, shared.usage)
+        shared.finish()
+
+    # -- Coalescing ----------------------------------------------------------
+    @staticmethod
+    def _key(kind, model, messages, params):
+        # Only requests in flight are kept, so the prompts themselves can be the key
+        contents = tuple(message["content"] for message in messages)
+        return kind, model, contents, tuple(sorted(params.items()))
+
+    def _join(self, key, create):
+        """
+        (handle, True) for the request already in flight under `key`, or
+        (create(), False) after registering a new one until forget(key).
+        """
+        with self._lock:
+            handle = self._in_flight.get(key)
+            if handle is not None:
+                self._stats["coalesced"] += 1
+                metrics.LLM_COALESCED.labels(key[0]).inc()
+                return handle, True
+            handle = self._in_flight[key] = create()
+            return handle, False
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _run_complete(self, key, future, family, model, messages, params):
+        try:
+            future.set_result(self._complete(family, model, messages, params))
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            self._forget(key)
+
+    def submit(self, model, messages, family="other", **params):
+        """Future of a Completion, sent from the gateway's threads. Identical requests in flight share one future."""
+        key = self._key("complete", model, messages, params)
+        future, joined = self._join(key, Future)
+        if not joined:
+            self._pool.submit(self._run_complete, key, future, family, model, messages, params)
+        return future
+
+    def complete(self, model, messages, family="other", **params):
+        """
+        Sends the request from the calling thread and returns its Completion,
+        or waits for an identical request already in flight.
+        """
+        key = self._key("complete", model, messages, params)
+        future, joined = self._join(key, Future)
+        if not joined:
+            self._run_complete(key, future, family, model, messages, params)
+        return future.result()
+
+    async def acomplete(self, model, messages, family="other", **params):
+        """complete() for asyncio code; the request itself runs on the gateway's threads."""
+        return await asyncio.wrap_future(self.submit(model, messages, family, **params))
+
+    def stream(self, model, messages, family="other", **params):
+        """
+        A SharedStream of the response. Identical streams in flight share
+        one request; each caller still iterates from the first chunk.
+        """
+        key = self._key("stream", model, messages, params)
+        shared, joined = self._join(key, SharedStream)
+        if not joined:
+            def run():
+                try:
+                    self._stream(family, model, messages, params, shared)
+                finally:
+                    self._forget(key)
+            self._pool.submit(run)
+        return shared
+
+###############################################################################
+# Configuration
+#
+#   LLM_REQUESTS_PER_MINUTE  request quota (default 30; 0 disables the limit)
+#   LLM_TOKENS_PER_MINUTE    token quota (default: no limit)
+#   LLM_MAX_CONCURRENCY      requests on the wire at once (default 4)
+#   LLM_RETRIES              retries of a 429/5xx/connection error (default 3)
+###############################################################################
+def gateway_from_env(get_client):
+    return LLMGateway(
+        get_client,
+        requests_per_minute=float(os.environ.get("LLM_REQUESTS_PER_MINUTE", 30)),
+        tokens_per_minute=float(os.environ.get("LLM_TOKENS_PER_MINUTE", 0)),
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 4)),
+        retries=int(os.environ.get("LLM_RETRIES", 3)),
+    )
@@ -1,17 +1,88 @@
 import streamlit as st
+import startup
+import board_render
+import llm
+import metrics
 st.set_page_config(layout="wide")  # Ensures a wide layout
 
 # Sidebar Navigation
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Chatbot", "Puzzles", "Play chess"])
+debug_panel = st.sidebar.checkbox("Debug panel", help="Show where the time of the last page run went")
+
+# Prometheus metrics on 127.0.0.1:$METRICS_PORT (off unless the variable is set)
+metrics.start_metrics_server()
 
 # Import the correct page dynamically
-if page == "Chatbot":
-    import chatbot
-    chatbot.main()
-elif page == "Puzzles":
-    import puzzles
-    puzzles.main()
-elif page == "Play chess":
-    import play_chess
-    play_chess.main()
\ No newline at end of file
+def show_page():
+    if page == "Chatbot":
+        import chatbot
+        chatbot.main()
+    elif page == "Puzzles":
+        import puzzles
+        puzzles.main()
+    elif page == "Play chess":
+        import play_chess
+        play_chess.main()
+
+# The first visit to each page in this process is timed as its cold start
+with metrics.trace() as spans:
+    try:
+        startup.run_page(page, show_page)
+    finally:
+        # Fragment reruns record nothing; keep the last full run's spans
+        if spans:
+            st.session_state.debug_spans = spans
+cold_start = startup.cold_start_times().get(page)
+if cold_start is not None:
+    st.sidebar.caption(f"Cold start: {cold_start * 1000:.0f} ms")
+
+render = board_render.render_stats()
+if render["render_ms"] is not None:
+    st.sidebar.caption(
+        f"Board render: {render['render_ms']:.1f} ms per render, "
+        f"{render['bytes_per_frame'] / 1024:.1f} KB per frame "
+        f"({render['hits']} cached / {render['misses']} rendered)"
+    )
+
+if debug_panel:
+    spans = st.session_state.get("debug_spans", [])
+    with st.expander("Debug panel: spans of the last run", expanded=True):
+        if not spans:
+            st.caption("Nothing was timed in the last run.")
+        else:
+            st.dataframe(
+                [
+                    {
+                        "span": record["name"],
+                        "start ms": round(record.get("start", 0) * 1000, 2),
+                        "ms": round(record["seconds"] * 1000, 2),
+                        "details": ", ".join(
+                            f"{key}={value}" for key, value in record.items()
+                            if key not in ("name", "seconds", "start")
+                        ),
+                    }
+                    for record in sorted(spans, key=lambda record: record.get("start", 0))
+                ],
+                use_container_width=True,
+            )
+
+    families = llm.family_stats.snapshot()
+    if families:
+        with st.expander("Debug panel: LLM calls by prompt family", expanded=True):
+            st.dataframe(
+                [
+                    {
+                        "family": family,
+                        "model": stats["model"],
+                        "calls": stats["calls"],
+                        "p50 ms": round(stats["p50_ms"]),
+                        "p95 ms": round(stats["p95_ms"]),
+                        "over budget": stats["over_budget"],
+                        "prompt tokens": stats["prompt_tokens"],
+                        "completion tokens / call": round(stats["completion_tokens_per_call"], 1),
+                    }
+                    for family, stats in sorted(families.items())
+                ],
+                use_container_width=True,
+            )
@@ -0,0 +1,149 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+except ImportError:  # metrics become no-ops, spans still work
+    prometheus_client = None
+
+###############################################################################
+# Prometheus metrics
+#
+# Exported on http://127.0.0.1:$METRICS_PORT/metrics once main.py has called
+# start_metrics_server() (nothing is served when METRICS_PORT is unset).
+###############################################################################
+class _NoMetric:
+    """Stand-in used when prometheus_client is not installed."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+def _histogram(name, documentation, labelnames=(), buckets=None):
+    if prometheus_client is None:
+        return _NoMetric()
+    kwargs = {"buckets": buckets} if buckets else {}
+    return prometheus_client.Histogram(name, documentation, labelnames, **kwargs)
+
+def _counter(name, documentation, labelnames=()):
+    if prometheus_client is None:
+        return _NoMetric()
+    return prometheus_client.Counter(name, documentation, labelnames)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+ENGINE_SECONDS = _histogram(
+    "chess_engine_seconds", "get_info latency by where the answer came from (local, cache, pv or engine)",
+    ["source"], LATENCY_BUCKETS)
+ENGINE_ERRORS = _counter("chess_engine_errors_total", "Failed get_info calls by error type", ["error"])
+
+LLM_SECONDS = _histogram(
+    "chess_llm_seconds", "Total latency of uncached Groq completions", ["family", "model"], LATENCY_BUCKETS)
+LLM_TTFT = _histogram(
+    "chess_llm_time_to_first_token_seconds", "Time until a streamed completion produced text",
+    ["family", "model"], LATENCY_BUCKETS)
+LLM_TOKENS = _counter("chess_llm_tokens_total", "Tokens used by Groq completions", ["family", "model", "kind"])
+LLM_ERRORS = _counter("chess_llm_errors_total", "Failed Groq completions by error type", ["family", "model", "error"])
+LLM_RETRIES = _counter("chess_llm_retries_total", "Groq requests retried, by status or error type", ["model", "reason"])
+LLM_COALESCED = _counter(
+    "chess_llm_coalesced_total", "Requests answered by an identical request already in flight", ["kind"])
+LLM_THROTTLE_SECONDS = _histogram(
+    "chess_llm_throttle_seconds", "Time requests waited for the rate limiter", (), LATENCY_BUCKETS)
+
+RENDER_SECONDS = _histogram("chess_render_seconds", "Time to render a board that was not cached", (), LATENCY_BUCKETS)
+RENDER_BYTES = _histogram(
+    "chess_render_bytes", "Size of each served board frame", (),
+    (5000, 10000, 20000, 30000, 40000, 60000, 100000))
+
+OPENING_SECONDS = _histogram(
+    "chess_opening_lookup_seconds", "Opening lookups by kind (find, suggest, identify)", ["kind"], LATENCY_BUCKETS)
+
+CACHE_REQUESTS = _counter("chess_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+
+def cache_result(cache, hit):
+    """Counts one lookup in `cache` ("analysis", "pv", "llm", "render")."""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+def token_counts(usage):
+    """{"prompt_tokens": n, "completion_tokens": n} of a Groq `usage` object (empty if None)."""
+    counts = {}
+    for name in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, name, None)
+        if count:
+            counts[name] = count
+    return counts
+
+def record_tokens(family, model, usage):
+    """Counts the prompt/completion tokens of a Groq `usage` object, if any."""
+    for name, count in token_counts(usage).items():
+        LLM_TOKENS.labels(family, model, name[:-len("_tokens")]).inc(count)
+
+_server_lock = threading.Lock()
+_server_port = None
+
+def start_metrics_server(port=None):
+    """
+    Serves /metrics on 127.0.0.1:`port` (default: $METRICS_PORT). Safe to
+    call on every Streamlit rerun; the server is only started once. Returns
+    the port, or None when metrics are disabled.
+    """
+    global _server_port
+    if prometheus_client is None:
+        return None
+    port = port or os.environ.get("METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server_port is None:
+            prometheus_client.start_http_server(int(port), addr="127.0.0.1")
+            _server_port = int(port)
+        return _server_port
+
+###############################################################################
+# Spans: a per-request breakdown of where the time went
+#
+# trace() collects the spans finished in the current context (one page run);
+# the debug panel in main.py shows them. Work started on other threads is not
+# part of the trace unless it runs in a copy of the context.
+###############################################################################
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+@contextmanager
+def trace():
+    """Collects the spans of everything run inside the block into a list."""
+    spans = []
+    token = _trace.set((spans, time.perf_counter()))
+    try:
+        yield spans
+    finally:
+        _trace.reset(token)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times the block. Yields the span record, a dict the block can add
+    attributes to (e.g. span["source"] = "cache"); "seconds" is set on exit
+    and "error" holds the exception type if the block raised.
+    """
+    record = {"name": name, **attributes}
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        current = _trace.get()
+        if current is not None:
+            spans, trace_started = current
+            record["start"] = started - trace_started
+            spans.append(record)
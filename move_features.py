@@ -0,0 +1,108 @@
+from collections import namedtuple
+
+import chess
+
+###############################################################################
+# Move characterization
+#
+# One place that says what a move does: which piece moves, what it captures,
+# whether it castles, takes en passant, promotes, checks or mates. Everything
+# works on the caller's chess.Board and chess.Move, so no FEN is re-parsed.
+# describe() briefly plays the move on that board (see below), so a board
+# must not be shared with other threads while it runs.
+###############################################################################
+PIECE_NAMES = {
+    chess.PAWN:   "PAWN",
+    chess.KNIGHT: "KNIGHT",
+    chess.BISHOP: "BISHOP",
+    chess.ROOK:   "ROOK",
+    chess.QUEEN:  "QUEEN",
+    chess.KING:   "KING",
+}
+
+# piece and captured are PIECE_NAMES values (captured/promotion None if not
+# applicable); castle is "kingside", "queenside" or None
+MoveFeatures = namedtuple(
+    "MoveFeatures",
+    "uci san piece captured castle en_passant promotion check mate",
+)
+
+def piece_name(piece_type):
+    return PIECE_NAMES.get(piece_type, "UNKNOWN")
+
+def describe(board, move):
+    """
+    MoveFeatures of `move` (a chess.Move or UCI string) played on `board`.
+    `move` must be legal on `board`. The board is back in its original
+    position when this returns, but board.san() pushes and pops the move
+    meanwhile, so it is not safe on a board another thread is reading:
+    give each thread its own board.copy().
+    """
+    if isinstance(move, str):
+        move = chess.Move.from_uci(move)
+    # board.san() already plays the move to see whether it checks or mates
+    san = board.san(move)
+    piece_type = board.piece_type_at(move.from_square)
+
+    castle = None
+    en_passant = False
+    if board.is_castling(move):
+        castle = "kingside" if board.is_kingside_castling(move) else "queenside"
+        captured = None
+    elif board.is_en_passant(move):
+        en_passant = True
+        captured = PIECE_NAMES[chess.PAWN]
+    else:
+        captured_type = board.piece_type_at(move.to_square)
+        captured = piece_name(captured_type) if captured_type else None
+
+    return MoveFeatures(
+        uci=move.uci(),
+        san=san,
+        piece=piece_name(piece_type),
+        captured=captured,
+        castle=castle,
+        en_passant=en_passant,
+        promotion=piece_name(move.promotion) if move.promotion else None,
+        check=san.endswith(("+", "#")),
+        mate=san.endswith("#"),
+    )
+
+def describe_moves(board, moves=None):
+    """describe() for each of `moves` on `board`, every legal move by default."""
+    if moves is None:
+        moves = board.legal_moves
+    return [describe(board, move) for move in moves]
+
+def describe_line(board, moves):
+    """
+    describe() for each ply of `moves` played in order from `board`, e.g.
+    describe_line(game.board(), game.mainline_moves()) for a whole game.
+    `board` itself is left unchanged.
+    """
+    board = board.copy(stack=False)
+    features = []
+    for move in moves:
+        if isinstance(move, str):
+            move = chess.Move.from_uci(move)
+        features.append(describe(board, move))
+        board.push(move)
+    return features
+
+def type_of_move(features):
+    """The short English description the move prompts use, e.g. "Capturing the KNIGHT with BISHOP"."""
+    if features.castle:
+        text = f"Castling with the {features.piece}"
+    elif features.en_passant:
+        text = f"Capturing the {features.captured} with {features.piece} en passant"
+    elif features.captured:
+        text = f"Capturing the {features.captured} with {features.piece}"
+    else:
+        text = f"Move the piece {features.piece}"
+    if features.promotion:
+        text += f", promoting to a {features.promotion}"
+    if features.mate:
+        text += ", delivering checkmate"
+    elif features.check:
+        text += ", giving check"
+    return text
@@ -0,0 +1,166 @@
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+import chess
+import chess.polyglot
+
+import metrics
+import openings
+
+BOOK_PATH = os.path.join(openings.THEORY_DIR, "book.bin")
+
+###############################################################################
+# Opening book compiled from the Theory TSVs
+#
+# The book is a standard polyglot .bin file: 16-byte big-endian entries of
+# (position key, move, weight, learn), sorted by key. The key is the same
+# polyglot Zobrist hash openings.py indexes by, and a move's weight is how
+# many named lines play it from that position. At runtime the file is
+# memory-mapped by chess.polyglot, so every process shares one copy.
+###############################################################################
+ENTRY = struct.Struct(">QHHI")
+
+def encode_move(board, move):
+    """Polyglot's 16-bit move: castling is written as the king taking its own rook."""
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if board.is_kingside_castling(move) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | (move.from_square << 6) | (promotion << 12)
+
+def compile_book(rows, path=BOOK_PATH):
+    """
+    Writes the book for the (eco, name, pgn) rows to `path`. Returns the
+    number of entries. The file is replaced atomically, so running
+    processes keep reading the old book until they reopen it.
+    """
+    counts = Counter()
+    for _, _, pgn in rows:
+        board = chess.Board()
+        for move in openings.pgn_moves(pgn):
+            counts[(openings.position_key(board), encode_move(board, move))] += 1
+            board.push(move)
+    # Polyglot readers binary-search by key; within a key, best moves first
+    entries = sorted(counts.items(), key=lambda item: (item[0][0], -item[1]))
+    # A temp file of its own: other workers may be compiling the same book
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix="book-", suffix=".tmp",
+                                     delete=False) as f:
+        try:
+            for (key, raw_move), weight in entries:
+                f.write(ENTRY.pack(key, raw_move, min(weight, 0xFFFF), 0))
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    # NamedTemporaryFile is private to its creator; the book is not
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+    return len(entries)
+
+
+class OpeningBook:
+    """A memory-mapped polyglot book."""
+
+    def __init__(self, path=BOOK_PATH):
+        self.path = path
+        self._reader = chess.polyglot.open_reader(path)
+
+    def __len__(self):
+        return len(self._reader)
+
+    def moves(self, board):
+        """[(move, weight), ...] of the book moves for `board`, heaviest first."""
+        return [(entry.move, entry.weight) for entry in self._reader.find_all(board)]
+
+    def contains(self, board, move):
+        """True if `move` from `board` is a book move."""
+        return any(entry.move == move for entry in self._reader.find_all(board))
+
+    def choose(self, board, rng=None):
+        """A book move for `board` drawn in proportion to its weight, or None when out of book."""
+        with metrics.span("book.choose") as span:
+            try:
+                move = self._reader.weighted_choice(board, random=rng or random).move
+            except IndexError:
+                move = None
+            span["found"] = move is not None
+        return move
+
+    def close(self):
+        self._reader.close()
+
+###############################################################################
+# When to leave the book
+#
+# Weaker settings leave theory sooner, so the game is not a replay of master
+# lines at a skill level that then plays far weaker moves. Each entry is
+# (lowest skill level, ply up to which the book is followed).
+###############################################################################
+BOOK_EXIT_PLIES = (
+    (1, 4),
+    (5, 8),
+    (9, 12),
+    (13, 20),
+)
+
+def exit_ply(skill_level):
+    """How many plies (both sides' moves) of the game are played from the book at this skill."""
+    plies = 0
+    for lowest, book_plies in BOOK_EXIT_PLIES:
+        if skill_level >= lowest:
+            plies = book_plies
+    return plies
+
+def book_move(board, skill_level, rng=None):
+    """
+    The AI's book reply on `board`, or None once the game is out of book or
+    past the exit ply for `skill_level` (the engine takes over from there).
+    """
+    if len(board.move_stack) >= exit_ply(skill_level):
+        return None
+    book = get_book()
+    return book.choose(board, rng) if book is not None else None
+
+def in_book(board, move):
+    """True if `move` played from `board` is a book move."""
+    book = get_book()
+    return book is not None and book.contains(board, move)
+
+_book = None
+_book_lock = threading.Lock()
+
+def _is_stale(path=BOOK_PATH):
+    if not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(source) > built for source in openings.THEORY_FILES)
+
+def get_book():
+    """
+    The process-wide OpeningBook, compiled from the TSVs the first time (and
+    whenever a TSV is newer than Theory/book.bin). None if it can't be built.
+    """
+    global _book
+    with _book_lock:
+        if _book is None:
+            try:
+                if _is_stale():
+                    compile_book(openings.read_theory_rows())
+                _book = OpeningBook(BOOK_PATH)
+            except OSError:
+                return None  # no TSVs, or a read-only checkout without a book
+        return _book
+
+
+if __name__ == "__main__":
+    # python opening_book.py build  -> (re)writes Theory/book.bin
+    if sys.argv[1:] != ["build"]:
+        sys.exit("usage: python opening_book.py build")
+    count = compile_book(openings.read_theory_rows())
+    print(f"Wrote {count} book entries ({os.path.getsize(BOOK_PATH) // 1024} KB) -> {BOOK_PATH}")
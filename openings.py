@@ -0,0 +1,335 @@
+import csv
+import os
+import pickle
+import re
+import sys
+import tempfile
+import threading
+from difflib import SequenceMatcher
+
+import chess
+import chess.polyglot
+import numpy as np
+
+import metrics
+
+THEORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Theory")
+THEORY_FILES = [os.path.join(THEORY_DIR, f"{letter}.tsv") for letter in "abcde"]
+POSITION_INDEX_PATH = os.path.join(THEORY_DIR, "positions.npz")
+NAME_INDEX_PATH = os.path.join(THEORY_DIR, "names.pkl")
+
+def read_theory_rows(paths=THEORY_FILES):
+    """Yields the (eco, name, pgn) rows of the Theory TSVs in file order."""
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                yield row["eco"], row["name"], row["pgn"]
+
+###############################################################################
+# Opening name index (replaces the row-by-row scan in functions.find)
+###############################################################################
+def normalize_name(name):
+    """
+    Canonical form used for lookups: lower case, apostrophes dropped and any
+    other punctuation collapsed to single spaces, so "King's Gambit" and
+    "kings   gambit" both become "kings gambit".
+    """
+    name = name.lower().replace("'", "").replace("’", "")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name).split())
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class OpeningIndex:
+    """
+    Precomputed lookup over the (eco, name, pgn) rows of the Theory TSVs.
+
+    find() is a single dict lookup on the normalized name. suggest() ranks
+    approximate matches: a trigram inverted index narrows the ~3,500 names to
+    a handful of candidates, which are then scored by edit similarity.
+    """
+
+    def __init__(self, rows):
+        self.rows = []
+        self._by_name = {}
+        self._names = []
+        self._gram_counts = []
+        self._postings = {}
+        for eco, name, pgn in rows:
+            key = normalize_name(name)
+            # Keep the first occurrence, the same row the old linear scan returned
+            if key in self._by_name:
+                continue
+            row = (eco, name, pgn)
+            self._by_name[key] = row
+            self.rows.append(row)
+            self._names.append(key)
+            grams = trigrams(key)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(len(self._names) - 1)
+        # Arrays so a query can count shared trigrams with one bincount
+        self._gram_counts = np.array(self._gram_counts, dtype=np.int32)
+        self._postings = {gram: np.array(ids, dtype=np.int32)
+                          for gram, ids in self._postings.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def find(self, name):
+        """Exact (normalized) lookup. Returns (eco, name, pgn) or None."""
+        return self._by_name.get(normalize_name(name))
+
+    def suggest(self, name, limit=5, candidates=10):
+        """
+        Returns up to `limit` (score, (eco, name, pgn)) pairs for the openings
+        whose names are closest to `name`, best first. Scores are in 0..1.
+        """
+        query = normalize_name(name)
+        if not query:
+            return []
+        query_grams = trigrams(query)
+        hits = [self._postings[gram] for gram in query_grams if gram in self._postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._names))
+        # Cheap Dice coefficient on trigrams picks the shortlist...
+        dice = 2 * shared / (len(query_grams) + self._gram_counts)
+        candidates = min(candidates, len(dice))
+        shortlist = np.argpartition(-dice, candidates - 1)[:candidates]
+        # ...and the more expensive edit similarity orders it
+        scored = []
+        for idx in shortlist:
+            score = SequenceMatcher(None, query, self._names[idx]).ratio()
+            scored.append((score, self.rows[idx]))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return scored[:limit]
+
+    def closest(self, name, cutoff=0.85):
+        """Exact match if there is one, else the best suggestion scoring >= cutoff."""
+        row = self.find(name)
+        if row is not None:
+            return row
+        suggestions = self.suggest(name, limit=1)
+        if suggestions and suggestions[0][0] >= cutoff:
+            return suggestions[0][1]
+        return None
+
+def _is_fresh(path, sources=THEORY_FILES):
+    """True if `path` exists and was written after every source TSV changed."""
+    if not os.path.exists(path):
+        return False
+    built = os.path.getmtime(path)
+    return all(os.path.getmtime(source) <= built for source in sources)
+
+def write_snapshot(path, write):
+    """
+    Calls write(f) on a private temp file next to `path` and then renames it
+    over `path`, so other processes only ever see a complete snapshot. Raises
+    OSError if the directory is not writable.
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=".snapshot-",
+                                     delete=False) as f:
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    # NamedTemporaryFile is private to its creator; the snapshot is not
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+_name_index = None
+_name_index_lock = threading.Lock()
+
+def _load_name_index():
+    with open(NAME_INDEX_PATH, "rb") as f:
+        return pickle.load(f)
+
+def name_index():
+    """
+    Returns the process-wide OpeningIndex. The TSVs are parsed once into a
+    pickle snapshot (Theory/names.pkl); later processes load the snapshot as
+    long as it is newer than every TSV and readable.
+    """
+    global _name_index
+    with _name_index_lock:
+        if _name_index is None:
+            index = None
+            if _is_fresh(NAME_INDEX_PATH):
+                try:
+                    index = _load_name_index()
+                except Exception:
+                    index = None  # truncated or corrupt: rebuilt below
+            if index is None:
+                index = OpeningIndex(read_theory_rows())
+                try:
+                    write_snapshot(NAME_INDEX_PATH, lambda f: pickle.dump(
+                        index, f, protocol=pickle.HIGHEST_PROTOCOL))
+                except OSError:
+                    pass  # read-only checkout: keep the in-memory index
+            _name_index = index
+    return _name_index
+
+###############################################################################
+# Position -> opening index (which named opening is this board in?)
+###############################################################################
+def position_key(board):
+    """64-bit polyglot Zobrist hash; identical for transposed move orders."""
+    return chess.polyglot.zobrist_hash(board)
+
+def pgn_moves(pgn):
+    """Parses a bare movetext line like "1. e4 c5 2. Nf3" into chess.Move objects."""
+    board = chess.Board()
+    moves = []
+    for token in pgn.split():
+        if token[0].isdigit() and token.endswith("."):
+            continue
+        moves.append(board.push_san(token))
+    return moves
+
+def build_position_index(rows):
+    """
+    Replays every PGN line and returns (keys, row_ids, max_ply) arrays:
+    keys[i] is the position key of some book position and row_ids[i] the row
+    of the deepest named opening on the way to it. Positions reached before
+    any named opening are left out.
+    """
+    rows = list(rows)
+    lines = []
+    named = {}                      # key of a line's final position -> row id
+    for row_id, (_, _, pgn) in enumerate(rows):
+        board = chess.Board()
+        keys = []
+        for move in pgn_moves(pgn):
+            board.push(move)
+            keys.append(position_key(board))
+        lines.append(keys)
+        if keys:
+            named.setdefault(keys[-1], row_id)
+
+    best = {}                       # key -> (ply of named ancestor, row id)
+    max_ply = 0
+    for keys in lines:
+        current = None
+        for ply, key in enumerate(keys, start=1):
+            if key in named:
+                current = (ply, named[key])
+            if current is not None:
+                previous = best.get(key)
+                if previous is None or current[0] > previous[0]:
+                    best[key] = current
+        max_ply = max(max_ply, len(keys))
+
+    keys = np.fromiter(best.keys(), dtype=np.uint64, count=len(best))
+    row_ids = np.fromiter((row_id for _, row_id in best.values()), dtype=np.int32, count=len(best))
+    return keys, row_ids, max_ply
+
+
+class PositionIndex:
+    """Maps any board to the deepest named opening it has passed through."""
+
+    def __init__(self, keys, row_ids, ecos, names, max_ply):
+        self._openings = {int(key): (str(ecos[row]), str(names[row]))
+                          for key, row in zip(keys.tolist(), row_ids.tolist())}
+        self.max_ply = int(max_ply)
+
+    def __len__(self):
+        return len(self._openings)
+
+    @classmethod
+    def build(cls, rows):
+        rows = list(rows)
+        keys, row_ids, max_ply = build_position_index(rows)
+        ecos = np.array([eco for eco, _, _ in rows])
+        names = np.array([name for _, name, _ in rows])
+        return cls(keys, row_ids, ecos, names, max_ply), (keys, row_ids, ecos, names, max_ply)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["keys"], data["row_ids"], data["ecos"], data["names"], data["max_ply"])
+
+    def lookup(self, board):
+        """(eco, name) if this exact position is a book position, else None."""
+        return self._openings.get(position_key(board))
+
+    def identify(self, board):
+        """
+        (eco, name) of the deepest opening for `board`. A position on a book
+        line is one dict lookup; after leaving the book the move stack is
+        unwound to the last book position. Boards set up from a bare FEN have
+        no history, so only the position itself is checked.
+        """
+        found = self.lookup(board)
+        if found is not None or not board.move_stack:
+            return found
+        board = board.copy()
+        # Nothing deeper than the longest book line can be in the index
+        while len(board.move_stack) > self.max_ply:
+            board.pop()
+        while board.move_stack:
+            board.pop()
+            found = self.lookup(board)
+            if found is not None:
+                return found
+        return None
+
+
+def save_position_index(arrays, path=POSITION_INDEX_PATH):
+    keys, row_ids, ecos, names, max_ply = arrays
+    write_snapshot(path, lambda f: np.savez_compressed(
+        f, keys=keys, row_ids=row_ids, ecos=ecos, names=names, max_ply=np.int32(max_ply)))
+
+_position_index = None
+_position_index_lock = threading.Lock()
+
+def position_index():
+    """
+    Returns the process-wide PositionIndex. It is loaded from
+    Theory/positions.npz when that is newer than the TSVs and readable, and
+    otherwise rebuilt from the PGNs (and saved for next time).
+    """
+    global _position_index
+    with _position_index_lock:
+        if _position_index is None:
+            index = None
+            if _is_fresh(POSITION_INDEX_PATH):
+                try:
+                    index = PositionIndex.load(POSITION_INDEX_PATH)
+                except Exception:
+                    index = None  # truncated or corrupt: rebuilt below
+            if index is None:
+                index, arrays = PositionIndex.build(read_theory_rows())
+                try:
+                    save_position_index(arrays)
+                except OSError:
+                    pass  # read-only checkout: keep the in-memory index
+            _position_index = index
+    return _position_index
+
+def identify(board):
+    """(eco, name) of the opening `board` (a chess.Board or FEN) is in, or None."""
+    with metrics.span("opening.identify") as span:
+        if isinstance(board, str):
+            board = chess.Board(board)
+        opening = position_index().identify(board)
+        span["found"] = opening is not None
+    metrics.OPENING_SECONDS.labels("identify").observe(span["seconds"])
+    return opening
+
+
+if __name__ == "__main__":
+    # python openings.py build  -> (re)writes Theory/names.pkl and positions.npz
+    if sys.argv[1:] != ["build"]:
+        sys.exit("usage: python openings.py build")
+    for path in (NAME_INDEX_PATH, POSITION_INDEX_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"Indexed {len(name_index())} opening names -> {NAME_INDEX_PATH}")
+    index, arrays = PositionIndex.build(read_theory_rows())
+    save_position_index(arrays)
+    print(f"Indexed {len(index)} positions (max {index.max_ply} plies) -> {POSITION_INDEX_PATH}")
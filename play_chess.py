@@ -1,65 +1,42 @@
 import streamlit as st
 import chess
-import chess.svg
-import base64
-import os
 import re
-import requests
-from dotenv import load_dotenv
-from groq import Groq
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import board_render
+import engines
+import functions
+import llm
+import move_features
+import opening_book
 
 ###############################################################################
 # 1) Remote Stockfish.online utility functions
 ###############################################################################
-def get_info(fen, depth):
+def get_info(fen, depth, exact=False):
     """
-    Queries the stockfish.online API with the given FEN and engine depth (<=16).
-    Returns a dictionary containing bestmove, evaluation, mate, and continuation.
+    Analyses the FEN with the configured engine backend (stockfish.online by
+    default, which caps the depth at 16, or a local UCI engine pool).
+    Returns a dictionary containing bestmove, ponder, evaluation, mate, and continuation.
+    Pass exact=True when the AI's move comes from the result, so a cached
+    deeper analysis can't make it play above its skill level.
     """
-    url = "https://stockfish.online/api/s/v2.php"
-    params = {"fen": fen, "depth": min(depth, 16)}  # cap the depth at 16
-
-    response = requests.get(url, params=params)
-    data = response.json()
-
-    if not data.get("success", False):
-        # If success is false, data["data"] might contain error info
-        raise ValueError(f"API Error: {data.get('data', 'Unknown error')}")
-
-    # Example response structure:
-    # {
-    #    "success": true,
-    #    "evaluation": 1.36,
-    #    "mate": null,
-    #    "bestmove": "bestmove b7b6 ponder f3e5",
-    #    "continuation": "b7b6 f3e5 h7h6 g5f6 f8f6 d2f3"
-    # }
-    bestmove_full = data["bestmove"]          # e.g. "bestmove b7b6 ponder f3e5"
-    bestmove_parts = bestmove_full.split()    # ["bestmove", "b7b6", "ponder", "f3e5"]
-    bestmove_uci   = bestmove_parts[1]        # "b7b6"
-    evaluation     = data["evaluation"]       # e.g. 1.36
-    mate_val       = data["mate"]             # e.g. None or +/- int
-    continuation   = data.get("continuation")
-
-    return {
-        "bestmove": bestmove_uci,
-        "evaluation": evaluation,
-        "mate": mate_val,
-        "continuation": continuation
-    }
+    return engines.get_info(fen, depth, exact=exact)
 
 def get_best_move(fen, depth):
     """Returns the best move in UCI format for the given FEN using the remote API."""
-    info = get_info(fen, depth)
+    info = get_info(fen, depth, exact=True)
     return info["bestmove"]
 
-def get_eval_string(fen, depth):
+def get_eval_string(fen, depth, info=None):
     """
     Returns a human-readable evaluation string:
       - "Mate in X moves for White/Black" if forced mate
       - Otherwise, e.g. "1.36 pawn advantage for white"
+    Pass `info` when the position has already been analysed this turn.
     """
-    info = get_info(fen, depth)
+    if info is None:
+        info = get_info(fen, depth)
     mate_val = info["mate"]
     eval_val = info["evaluation"]
 
@@ -72,53 +49,54 @@ def get_eval_string(fen, depth):
         return f"{abs(eval_val)} pawn advantage for {sign_str}"
 
 ###############################################################################
-# 2) Move characterization (to replicate your 'for_the_game' logic)
+# 2) Move characterization (shared with functions.for_the_game via move_features)
 ###############################################################################
-def type_of_move_and_eval(move_uci, fen, depth):
+def type_of_move_and_eval(move, board, depth, info=None, book=False):
     """
     Determines if the move is a capture or a castle, which piece moves, etc.
-    Also gets a user-friendly evaluation string via the remote API.
+    (see move_features.describe), for a chess.Move or UCI string played on
+    `board`, a chess.Board or FEN.
+    Also gets a user-friendly evaluation string, reusing `info` if the caller
+    already analysed the position and querying the engine otherwise. For a
+    book move (book=True) the evaluation names the theory instead, so no
+    engine call is made at all.
     Returns: (type_of_move, evaluation_string)
     """
-    board = chess.Board(fen)
-    move = chess.Move.from_uci(move_uci)
-
-    source_piece = board.piece_at(move.from_square)
-    target_piece = board.piece_at(move.to_square)
-
-    # Fallback names if piece_map fails (rare)
-    piece_map = {
-        chess.PAWN:   "PAWN",
-        chess.KNIGHT: "KNIGHT",
-        chess.BISHOP: "BISHOP",
-        chess.ROOK:   "ROOK",
-        chess.QUEEN:  "QUEEN",
-        chess.KING:   "KING",
-    }
-    if source_piece:
-        p1 = piece_map.get(source_piece.piece_type, "UNKNOWN")
+    if isinstance(board, str):
+        board = chess.Board(board)
+    type_of_move = move_features.type_of_move(move_features.describe(board, move))
+    if book:
+        evaluation_string = book_evaluation(board, move)
     else:
-        p1 = "UNKNOWN"
+        evaluation_string = get_eval_string(board.fen(), depth, info)
+    return type_of_move, evaluation_string
 
-    if target_piece:
-        p2 = piece_map.get(target_piece.piece_type, "UNKNOWN")
-    else:
-        p2 = None
+def book_evaluation(board, move):
+    """Stands in for the engine evaluation of a book move: the opening it belongs to."""
+    after = board.copy()
+    after.push(chess.Move.from_uci(move) if isinstance(move, str) else move)
+    opening = functions.identify_opening(after)
+    if opening:
+        return f"opening theory (a book move in the {opening[1]})"
+    return "opening theory (a book move)"
 
-    # Detect castling
-    is_castle_move = (
-        (move_uci in ["e1g1", "e1c1", "e8g8", "e8c8"]) and p1 == "KING"
-    )
+class TurnAnalysis:
+    """
+    Engine analysis for the positions of a single turn. Every position is
+    analysed at most once and the result is shared by move characterization,
+    evaluation formatting and the AI's own move choice.
+    """
 
-    if is_castle_move:
-        type_of_move = f"Castling with the {p1}"
-    elif target_piece is not None:
-        type_of_move = f"Capturing the {p2} with {p1}"
-    else:
-        type_of_move = f"Move the piece {p1}"
+    def __init__(self, depth):
+        self.depth = depth
+        self._infos = {}
 
-    evaluation_string = get_eval_string(fen, depth)
-    return type_of_move, evaluation_string
+    def info(self, board, exact=False):
+        """The analysis of `board`; exact=True for the position the AI moves from (see get_info)."""
+        key = (board.fen(), exact)
+        if key not in self._infos:
+            self._infos[key] = get_info(key[0], self.depth, exact)
+        return self._infos[key]
 
 ###############################################################################
 # 3) LLM cleanup function
@@ -130,96 +108,252 @@ def clean(response):
 ###############################################################################
 # 4) Streamlit app
 ###############################################################################
-load_dotenv()
+def user_move_prompt(move_uci, type_of_move, evaluation):
+    return (
+        f"Please tell me how is the move which is {move_uci} with an evaluation of "
+        f"{evaluation} and the type of move is {type_of_move}."
+    )
 
-# Initialize Groq client
-try:
-    client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
-except Exception as e:
-    client = None
-    st.error(f"Failed to initialize Groq: {str(e)}")
+def ai_move_prompt(move_uci, type_of_move, evaluation):
+    return (
+        f"Please tell me the commentary of the move which is {move_uci} with an evaluation "
+        f"of {evaluation} and the type of move is {type_of_move}"
+    )
 
-def user_move_analysis(board, move,depth):
+def commentary(family, system, user, stream=False):
     """
-    Analyze a chess move using Groq LLM, from the user's perspective.
+    Runs a commentary prompt and returns the clean()ed text, or with
+    stream=True a generator of visible chunks. Failures turn into a short
+    "unavailable" note instead of an exception; that includes a missing
+    GROQ_API_KEY, which only matters when no analysis service answers
+    for this worker (llm.py forwards to it when one is configured).
+    """
+    if stream:
+        return _stream_commentary(family, system, user)
+    try:
+        return clean(llm.complete(family, system, user))
+    except Exception as e:
+        return f"Move analysis unavailable: {str(e)}"
+
+def _stream_commentary(family, system, user):
+    try:
+        yield from llm.stream_visible(family, system, user)
+    except Exception as e:
+        yield f"Move analysis unavailable: {str(e)}"
+
+# Commentary is written off the script thread so the board never waits on it
+_commentary_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="commentary")
+
+class CommentaryJob:
     """
-    if not client:
-        return "Move analysis unavailable: Groq client not initialized"
+    A commentary being written on the worker pool. `produce` returns the
+    commentary as a string or a stream of chunks; `text` grows as chunks
+    arrive, so the page can show partial commentary while polling.
+    """
+
+    def __init__(self, produce):
+        self.text = ""
+        self.done = False
+        self._lock = threading.Lock()
+        self.future = _commentary_pool.submit(self._run, produce)
 
-    fen = board.fen()
+    def _run(self, produce):
+        try:
+            result = produce()
+            for chunk in ([result] if isinstance(result, str) else result):
+                with self._lock:
+                    self.text += chunk
+        except Exception as e:
+            with self._lock:
+                self.text = f"Move analysis unavailable: {str(e)}"
+        finally:
+            self.done = True
+
+    def snapshot(self):
+        with self._lock:
+            return self.text
+
+def user_move_analysis(board, move, depth, info=None, stream=False, book=False):
+    """
+    Analyze a chess move using Groq LLM, from the user's perspective.
+    `info` is the engine analysis of `board` if the turn already has it;
+    book=True explains a book move from theory, without the engine.
+    With stream=True the commentary is returned as a generator of chunks.
+    """
     move_uci = move.uci() if isinstance(move, chess.Move) else move
 
-    # 1) Derive the type_of_move + evaluation from the remote API
-    type_of_move, evaluation = type_of_move_and_eval(move_uci, fen, depth)
+    # 1) Derive the type_of_move + evaluation from the engine analysis
+    type_of_move, evaluation = type_of_move_and_eval(move, board, depth, info, book)
 
     # 2) Build your prompt
-    prompt = (
-        f"Please tell me how is the move which is {move_uci} with an evaluation of "
-        f"{evaluation} and the type of move is {type_of_move}."
-    )
+    prompt = user_move_prompt(move_uci, type_of_move, evaluation)
 
     # 3) Call Groq
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a top-tier chess coach with deep strategic and tactical mastery. "
-                        "Your task is to criticize the move that was played with correct information, "
-                        "praise if the move was good and scold if the move was rubbish. "
-                        "Do not use markdown, and the commentary should not exceed 3 lines. "
-                        "DO NOT USE UCI NOTATION but use English. Positive evaluation favors White, "
-                        "and negative favors Black. "
-                        "Do not keep one appreciating the user but be very brutal and mostly be critical to the user, be lightly harsh to the user."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-            model="deepseek-r1-distill-llama-70b",
-        )
-        return clean(chat_completion.choices[0].message.content)
-    except Exception as e:
-        return f"Move analysis unavailable: {str(e)}"
+    return commentary(
+        "user_move",
+        system=(
+            "You are a top-tier chess coach with deep strategic and tactical mastery. "
+            "Your task is to criticize the move that was played with correct information, "
+            "praise if the move was good and scold if the move was rubbish. "
+            "Do not use markdown, and the commentary should not exceed 3 lines. "
+            "DO NOT USE UCI NOTATION but use English. Positive evaluation favors White, "
+            "and negative favors Black. "
+            "Do not keep one appreciating the user but be very brutal and mostly be critical to the user, be lightly harsh to the user."
+        ),
+        user=prompt,
+        stream=stream,
+    )
 
-def ai_move_analysis(board, move,depth):
+def ai_move_analysis(board, move, depth, info=None, stream=False, book=False):
     """
     Analyze a chess move using Groq LLM, from the AI's perspective.
+    `info` is the engine analysis of `board` if the turn already has it;
+    book=True explains a book move from theory, without the engine.
+    With stream=True the commentary is returned as a generator of chunks.
     """
-    if not client:
-        return "Move analysis unavailable: Groq client not initialized"
-
-    fen = board.fen()
     move_uci = move.uci() if isinstance(move, chess.Move) else move
 
-    type_of_move, evaluation = type_of_move_and_eval(move_uci, fen, depth)
-
-    prompt = (
-        f"Please tell me the commentary of the move which is {move_uci} with an evaluation "
-        f"of {evaluation} and the type of move is {type_of_move}"
+    type_of_move, evaluation = type_of_move_and_eval(move, board, depth, info, book)
+
+    prompt = ai_move_prompt(move_uci, type_of_move, evaluation)
+
+    return commentary(
+        "ai_move",
+        system=(
+            "You are a top-tier chess coach with deep strategic and tactical mastery. "
+            "Your task is to give the commentary of the move that was played, the advantages "
+            "and disadvantages of the move, with correct information. Do not use markdown, "
+            "and the commentary should not exceed 3 lines. DO NOT USE UCI NOTATION but use English. "
+            "Positive evaluation favors White, and negative favors Black."
+        ),
+        user=prompt,
+        stream=stream,
     )
 
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a top-tier chess coach with deep strategic and tactical mastery. "
-                        "Your task is to give the commentary of the move that was played, the advantages "
-                        "and disadvantages of the move, with correct information. Do not use markdown, "
-                        "and the commentary should not exceed 3 lines. DO NOT USE UCI NOTATION but use English. "
-                        "Positive evaluation favors White, and negative favors Black."
-                    ),
-                },
-                {"role": "user", "content": prompt},
-            ],
-            model="deepseek-r1-distill-llama-70b",
+###############################################################################
+# 5) Speculative prefetch of the user's reply
+#
+# While the user thinks about their move, the most likely replies are played
+# out in the background: the engine's answer to each and both commentaries.
+# If the user then plays one of them, the AI answers at once.
+###############################################################################
+PREFETCH_MOVES = 2      # predicted replies worked out per turn (0 disables)
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+class Speculation:
+    """
+    The next turn worked out in advance for the user playing `move` from
+    `board`: `reply` is the engine analysis after the move (bestmove is the
+    AI's answer), and `user_assessment` / `ai_explanation` the commentaries.
+    All three are Futures.
+    """
+
+    def __init__(self, board, move, depth):
+        self.move = move
+        self.reply = Future()
+        self.ai_explanation = Future()
+        # Each task gets its own board: board.san() (via move_features.describe)
+        # pushes and pops moves, so a board shared between threads can be
+        # read mid-move by another one
+        user_board = board.copy()
+        self.user_assessment = _prefetch_pool.submit(
+            lambda: user_move_analysis(user_board, move, depth, info=get_info(user_board.fen(), depth))
         )
-        return clean(chat_completion.choices[0].message.content)
-    except Exception as e:
-        return f"Move analysis unavailable: {str(e)}"
+        _prefetch_pool.submit(self._answer, board.copy(), move, depth)
+
+    def _answer(self, board, move, depth):
+        after = board.copy()
+        after.push(move)
+        try:
+            info = get_info(after.fen(), depth, exact=True)
+        except Exception as e:
+            self.reply.set_exception(e)
+            self.ai_explanation.set_exception(e)
+            return
+        self.reply.set_result(info)
+        try:
+            ai_move = chess.Move.from_uci(info["bestmove"])
+            self.ai_explanation.set_result(ai_move_analysis(after, ai_move, depth, info=info))
+        except Exception as e:
+            self.ai_explanation.set_exception(e)
 
+class Prefetcher:
+    """
+    Per-session speculative cache. start() is called after every AI move
+    with the AI's own analysis: its ponder move is speculated on straight
+    away, and the engine's best move for the user once the user's position
+    has been analysed. take() hands back the Speculation for the move the
+    user actually played, and keeps count of hits and misses.
+    """
+
+    def __init__(self, max_moves=PREFETCH_MOVES):
+        self.max_moves = max_moves
+        self.hits = 0
+        self.misses = 0
+        self._fen = None
+        self._depth = None
+        self._speculations = {}
+        self._lock = threading.Lock()
+
+    def start(self, board, depth, ai_info=None):
+        board = board.copy()
+        with self._lock:
+            self._fen, self._depth = board.fen(), depth
+            self._speculations = {}
+        if self.max_moves <= 0 or board.is_game_over():
+            return
+        if ai_info:
+            # The AI's line continues with the reply it expects from the user
+            continuation = (ai_info.get("continuation") or "").split()
+            ponder = ai_info.get("ponder") or (continuation[1] if len(continuation) > 1 else None)
+            self._speculate(board, depth, ponder)
+        # A copy of its own: the speculations above are already using `board`
+        _prefetch_pool.submit(self._predict, board.copy(), depth)
+
+    def _predict(self, board, depth):
+        try:
+            info = get_info(board.fen(), depth)
+        except Exception:
+            return
+        self._speculate(board, depth, info["bestmove"])
+
+    def _speculate(self, board, depth, move_uci):
+        try:
+            move = chess.Move.from_uci(move_uci) if move_uci else None
+        except ValueError:
+            return
+        if move is None or move not in board.legal_moves:
+            return
+        with self._lock:
+            # Drop predictions for a position the game has already left
+            if board.fen() != self._fen or depth != self._depth:
+                return
+            if move_uci in self._speculations or len(self._speculations) >= self.max_moves:
+                return
+            self._speculations[move_uci] = Speculation(board, move, depth)
+
+    def take(self, board, move, depth):
+        """The Speculation for `move` played from `board`, or None on a miss."""
+        with self._lock:
+            if board.fen() != self._fen or depth != self._depth:
+                return None
+            speculation = self._speculations.get(move.uci())
+            self._fen, self._speculations = None, {}
+            if speculation is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return speculation
+
+    def hit_rate(self):
+        """Share of predicted turns where the user played a prefetched move."""
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+###############################################################################
+# 6) Board and page layout
+###############################################################################
 def initialize_board():
     """Initialize or return existing chess board from session state"""
     if 'board' not in st.session_state:
@@ -234,13 +368,17 @@ def initialize_board():
         st.session_state.skill_level = 5
     if 'move_executed' not in st.session_state:
         st.session_state.move_executed = False
+    if 'commentary_jobs' not in st.session_state:
+        st.session_state.commentary_jobs = {}
+    if 'prefetcher' not in st.session_state:
+        st.session_state.prefetcher = Prefetcher()
+    if 'book_moves' not in st.session_state:
+        st.session_state.book_moves = 0
     return st.session_state.board
 
 def render_board(board):
-    """Display the chess board as an SVG image"""
-    board_svg = chess.svg.board(board=board)
-    b64 = base64.b64encode(board_svg.encode('utf-8')).decode("utf-8")
-    return f'<img src="data:image/svg+xml;base64,{b64}" width="400"/>'
+    """Display the chess board as an SVG image (cached, with the last move highlighted)"""
+    return board_render.board_html(board, lastmove=board_render.last_move(board))
 def reset_board():
     """Resets the game board and clears session state."""
     st.session_state.board = chess.Board()
@@ -248,8 +386,36 @@ def reset_board():
     st.session_state.ai_explanation = None
     st.session_state.user_assessment = None
     st.session_state.move_executed = False
+    st.session_state.commentary_jobs = {}
+    st.session_state.prefetcher = Prefetcher()
+    st.session_state.book_moves = 0
     st.rerun()
 
+def commentary_panel():
+    """
+    The two commentary columns. While commentary jobs are running this is
+    re-run as a fragment every half second to show their partial text; once
+    both are done the results are kept in session state and the page reruns.
+    """
+    jobs = st.session_state.commentary_jobs
+    ai_text = jobs["ai"].snapshot() if "ai" in jobs else st.session_state.ai_explanation
+    user_text = jobs["user"].snapshot() if "user" in jobs else st.session_state.user_assessment
+
+    st.subheader("AI Move Explanation")
+    if ai_text:
+        st.text(ai_text)
+    st.subheader("User Move Assessment")
+    if user_text:
+        st.text(user_text)
+
+    if jobs and all(job.done for job in jobs.values()):
+        if "ai" in jobs:
+            st.session_state.ai_explanation = jobs["ai"].snapshot()
+        if "user" in jobs:
+            st.session_state.user_assessment = jobs["user"].snapshot()
+        st.session_state.commentary_jobs = {}
+        st.rerun()
+
 def main():
     st.title("Play Chess vs Remote Stockfish (API)")
 
@@ -260,9 +426,17 @@ def main():
     skill_level = st.slider("Stockfish Skill Level (approx. depth)", 1, 16, st.session_state.skill_level)
     st.session_state.skill_level = skill_level
     depth=skill_level
+    book_mode = st.checkbox(
+        "Play from the opening book", value=True, key="book_mode",
+        help=f"The AI answers instantly with theory moves for the first "
+             f"{opening_book.exit_ply(skill_level)} plies at this skill level, without the engine",
+    )
     col1, col2 = st.columns(2)
     with col1:
         st.markdown(render_board(board), unsafe_allow_html=True)
+        opening = functions.identify_opening(board)
+        if opening:
+            st.caption(f"Opening: {opening[1]} ({opening[0]})")
         user_move = st.text_input(
             "Your move (e.g., e2e4):",
             key="move_input",
@@ -273,35 +447,72 @@ def main():
         try:
             move = chess.Move.from_uci(user_move)
             if move in board.legal_moves:
-                # 1) User plays move
+                # Each position of this turn is analysed once and shared
+                turn = TurnAnalysis(depth)
+                prefetcher = st.session_state.prefetcher
+                speculation = prefetcher.take(board, move, depth)
+
+                # 1) User plays move; its commentary is written in the background
                 board.push(move)
-                user_analysis = user_move_analysis(previous_board, move, depth)
-                st.session_state.user_assessment = user_analysis
+                user_board = previous_board
+                # A book move is explained from theory, without an engine evaluation
+                user_in_book = book_mode and opening_book.in_book(user_board, move)
+                if speculation:
+                    jobs = {"user": CommentaryJob(speculation.user_assessment.result)}
+                else:
+                    jobs = {
+                        "user": CommentaryJob(lambda: user_move_analysis(
+                            user_board, move, depth,
+                            info=None if user_in_book else turn.info(user_board),
+                            stream=True, book=user_in_book,
+                        )),
+                    }
                 previous_board = board.copy()
 
-                # 2) AI's response from Remote Stockfish
-                #    Instead of local stockfish, we do:
-                fen = board.fen()
+                # 2) AI's response: straight from the opening book while the
+                #    game is still in it, otherwise from Remote Stockfish
                 depth = min(skill_level, 16)
-                try:
-                    info = get_info(fen, depth)
-                    ai_move_uci = info["bestmove"]
-                except Exception as api_error:
-                    st.error(f"Could not retrieve AI move: {str(api_error)}")
-                    ai_move_uci = None
-
-                # 3) If we got a valid AI move, push it and analyze
+                info = None
+                ai_book_move = opening_book.book_move(board, skill_level) if book_mode else None
+                if ai_book_move is not None:
+                    ai_move_uci = ai_book_move.uci()
+                    st.session_state.book_moves += 1
+                else:
+                    try:
+                        info = speculation.reply.result() if speculation else turn.info(board, exact=True)
+                        ai_move_uci = info["bestmove"]
+                    except Exception as api_error:
+                        st.error(f"Could not retrieve AI move: {str(api_error)}")
+                        ai_move_uci = None
+
+                # 3) If we got a valid AI move, push it; the board is redrawn
+                #    right away and the commentary follows in the background
                 if ai_move_uci:
                     ai_move_obj = chess.Move.from_uci(ai_move_uci)
                     if ai_move_obj in board.legal_moves:
                         board.push(ai_move_obj)
-                        ai_analysis = ai_move_analysis(previous_board, ai_move_obj, depth)
-                        st.session_state.ai_explanation = ai_analysis
+                        # The position before the AI move is the one we just analysed
+                        ai_board = previous_board
+                        if ai_book_move is not None:
+                            jobs["ai"] = CommentaryJob(lambda: ai_move_analysis(
+                                ai_board, ai_move_obj, depth, stream=True, book=True
+                            ))
+                        elif speculation:
+                            jobs["ai"] = CommentaryJob(speculation.ai_explanation.result)
+                        else:
+                            jobs["ai"] = CommentaryJob(lambda: ai_move_analysis(
+                                ai_board, ai_move_obj, depth, info=info, stream=True
+                            ))
                         previous_board = board.copy()
+                        # 4) Work out the user's likely replies while they think
+                        #    (not while in book: that would cost engine calls)
+                        if info is not None:
+                            prefetcher.start(board, depth, info)
                     else:
                         st.warning("AI move was invalid in this position!")
                 
                 # Update session state
+                st.session_state.commentary_jobs = jobs
                 st.session_state.board = board
                 st.session_state.move_executed = True
                 st.rerun()
@@ -312,12 +523,19 @@ def main():
 
     st.session_state.move_executed = False
     with col2:
-        st.subheader("AI Move Explanation")
-        if st.session_state.ai_explanation:
-            st.text(st.session_state.ai_explanation)
-        st.subheader("User Move Assessment")
-        if st.session_state.user_assessment:
-            st.text(st.session_state.user_assessment)
+        # Poll only while commentary is still being written
+        polling = 0.5 if st.session_state.commentary_jobs else None
+        st.fragment(commentary_panel, run_every=polling)()
+
+    if st.session_state.book_moves:
+        st.sidebar.caption(f"Book moves played without the engine: {st.session_state.book_moves}")
+
+    prefetcher = st.session_state.prefetcher
+    if prefetcher.hit_rate() is not None:
+        st.sidebar.caption(
+            f"Prefetch hit rate: {prefetcher.hit_rate():.0%} "
+            f"({prefetcher.hits}/{prefetcher.hits + prefetcher.misses} moves)"
+        )
 
     # Check final states
 # Check final states
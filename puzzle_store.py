@@ -0,0 +1,330 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import chess
+import numpy as np
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(PACKAGE_DIR, "PuzzleStore")
+
+# Source CSVs (Lichess puzzle format: PuzzleId,FEN,Moves,Rating,...,Themes,...).
+# The copies in the repo are git-lfs pointers unless LFS is installed, so the
+# media URL is the fallback source.
+PUZZLE_SOURCES = {
+    "Easy": ("easy.csv", "https://media.githubusercontent.com/media/adityaamehra/Chess-tutor/refs/heads/main/easy.csv"),
+    "Medium": ("medium.csv", "https://media.githubusercontent.com/media/adityaamehra/Chess-tutor/refs/heads/main/medium.csv"),
+    "Hard": ("hard.csv", "https://media.githubusercontent.com/media/adityaamehra/Chess-tutor/refs/heads/main/hard.csv"),
+}
+
+# solver is the colour the user plays (chess.WHITE/BLACK); it is only known
+# for stores precompiled by validate_puzzles.py and None otherwise
+Puzzle = namedtuple("Puzzle", "fen moves rating themes solver", defaults=(None,))
+
+###############################################################################
+# On-disk layout
+#
+# Each difficulty is a directory of .npy arrays, with rows sorted by rating:
+#     ratings.npy                     int32[n], ascending
+#     fen.npy / fen_offsets.npy       utf-8 bytes of every FEN, and n+1 offsets
+#     moves.npy / moves_offsets.npy   the same for the space separated moves
+#     themes.npy / themes_offsets.npy the same for the themes (may be empty)
+# Stores precompiled by validate_puzzles.py also have:
+#     solver.npy                      bool[n], True if the user plays White
+#     codes.npy / codes_offsets.npy   the moves pre-parsed as uint16 codes
+# A store built from a local CSV records that CSV's size and SHA-256 in
+#     source.json
+# The arrays are opened with mmap, so worker processes share one copy through
+# the OS page cache and nothing is parsed when a store is opened.
+###############################################################################
+TEXT_COLUMNS = ("fen", "moves", "themes")
+SOURCE_FILE = "source.json"
+
+def _pack(strings):
+    """(blob, offsets) for a list of strings: row i is blob[offsets[i]:offsets[i+1]]."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+def encode_move(move):
+    """Packs a chess.Move into 16 bits: from | to << 6 | promotion << 12."""
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+def decode_move(code):
+    return chess.Move(code & 63, code >> 6 & 63, code >> 12 or None)
+
+def read_puzzle_rows(f):
+    """Yields (fen, moves, rating, themes) from a puzzle CSV file object."""
+    for row in csv.DictReader(f):
+        yield row["FEN"], row["Moves"], int(row["Rating"]), row.get("Themes") or ""
+
+_lock_state = threading.local()
+
+@contextmanager
+def store_lock():
+    """
+    Held while a store is checked, built, swapped in or opened, so no worker
+    process ever sees a store directory half-replaced. An flock on
+    STORE_DIR/.lock (one per open file, so threads exclude each other too);
+    re-entrant within a thread.
+    """
+    if getattr(_lock_state, "depth", 0):
+        _lock_state.depth += 1
+        try:
+            yield
+        finally:
+            _lock_state.depth -= 1
+        return
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(os.path.join(STORE_DIR, ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        _lock_state.depth = 1
+        try:
+            yield
+        finally:
+            _lock_state.depth = 0
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def write_store(rows, path, source=None):
+    """
+    Sorts the rows by rating and writes them as a store directory at `path`.
+    Rows are (fen, moves, rating, themes), optionally followed by the
+    precompiled (solver, move codes) columns. `source` is the
+    source_fingerprint() of the CSV the rows came from, if known.
+    """
+    rows = sorted(rows, key=lambda row: row[2])
+    # A directory of its own: other workers may be building the same store
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}-")
+    try:
+        _write_columns(rows, tmp, source)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    os.chmod(tmp, 0o755)  # mkdtemp directories are private to their creator
+    # Swap the finished store in under the lock, so readers never see a
+    # half-written store or none at all
+    with store_lock():
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    return len(rows)
+
+def _write_columns(rows, tmp, source):
+    np.save(os.path.join(tmp, "ratings.npy"), np.array([row[2] for row in rows], dtype=np.int32))
+    for column, values in zip(TEXT_COLUMNS, ([row[0] for row in rows],
+                                             [row[1] for row in rows],
+                                             [row[3] for row in rows])):
+        blob, offsets = _pack(values)
+        np.save(os.path.join(tmp, f"{column}.npy"), blob)
+        np.save(os.path.join(tmp, f"{column}_offsets.npy"), offsets)
+    if rows and len(rows[0]) > 4:
+        np.save(os.path.join(tmp, "solver.npy"), np.array([row[4] for row in rows], dtype=np.bool_))
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(row[5]) for row in rows], out=offsets[1:])
+        codes = np.fromiter((code for row in rows for code in row[5]), dtype=np.uint16, count=offsets[-1])
+        np.save(os.path.join(tmp, "codes.npy"), codes)
+        np.save(os.path.join(tmp, "codes_offsets.npy"), offsets)
+    if source is not None:
+        with open(os.path.join(tmp, SOURCE_FILE), "w", encoding="utf-8") as f:
+            json.dump(source, f)
+
+
+class PuzzleStore:
+    """
+    Read-only view of a store directory. Rating ranges are two binary searches
+    over the sorted ratings, and a random puzzle in a range is one random
+    index, so no per-request work depends on the number of puzzles.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.ratings = load("ratings")
+        self._columns = {column: (load(column), load(f"{column}_offsets"))
+                         for column in TEXT_COLUMNS}
+        self.compiled = os.path.exists(os.path.join(path, "solver.npy"))
+        if self.compiled:
+            self._solver = load("solver")
+            self._codes = (load("codes"), load("codes_offsets"))
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def _text(self, column, i):
+        blob, offsets = self._columns[column]
+        start, stop = offsets[i:i + 2].tolist()
+        return blob[start:stop].tobytes().decode("utf-8")
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        themes = self._text("themes", i)
+        solver = bool(self._solver[i]) if self.compiled else None
+        return Puzzle(self._text("fen", i), self._text("moves", i).split(),
+                      int(self.ratings[i]), themes.split(), solver)
+
+    def solution(self, i):
+        """The moves of puzzle `i` as chess.Move objects, pre-parsed if compiled."""
+        if not self.compiled:
+            return [chess.Move.from_uci(uci) for uci in self[i].moves]
+        codes, offsets = self._codes
+        start, stop = offsets[i:i + 2].tolist()
+        return [decode_move(code) for code in codes[start:stop].tolist()]
+
+    def rating_bounds(self):
+        """(lowest, highest) rating in the store, or None if it is empty."""
+        if not len(self):
+            return None
+        return int(self.ratings[0]), int(self.ratings[-1])
+
+    def rating_range(self, low=None, high=None):
+        """(start, stop) row range of the puzzles rated low..high inclusive."""
+        # Searching with an int32 key keeps numpy from casting the whole array
+        start = 0 if low is None else int(self.ratings.searchsorted(np.int32(low), side="left"))
+        stop = len(self) if high is None else int(self.ratings.searchsorted(np.int32(high), side="right"))
+        return start, max(start, stop)
+
+    def count(self, low=None, high=None):
+        start, stop = self.rating_range(low, high)
+        return stop - start
+
+    def sample(self, low=None, high=None, theme=None, rng=None, attempts=100):
+        """
+        A uniformly random Puzzle rated low..high, or None if there is none.
+        With `theme` the range is sampled until a puzzle with that theme tag
+        turns up (giving up after `attempts` draws). `rng` is anything with a
+        randrange() method, e.g. a seeded random.Random.
+        """
+        start, stop = self.rating_range(low, high)
+        if start == stop:
+            return None
+        rng = rng or random
+        for _ in range(attempts if theme else 1):
+            puzzle = self[rng.randrange(start, stop)]
+            if theme is None or theme in puzzle.themes:
+                return puzzle
+        return None
+
+###############################################################################
+# Building from the CSVs
+###############################################################################
+def _is_lfs_pointer(path):
+    with open(path, "rb") as f:
+        return f.read(40).startswith(b"version https://git-lfs")
+
+def open_source(difficulty):
+    """
+    A text file object with the puzzle CSV for `difficulty`: the local copy
+    when it holds real data, else the download from the media URL.
+    """
+    filename, url = PUZZLE_SOURCES[difficulty]
+    local = os.path.join(PACKAGE_DIR, filename)
+    if os.path.exists(local) and not _is_lfs_pointer(local):
+        return open(local, newline="", encoding="utf-8")
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    return io.StringIO(response.text, newline="")
+
+def store_path(difficulty):
+    return os.path.join(STORE_DIR, difficulty.lower())
+
+def source_fingerprint(difficulty):
+    """
+    {"size", "sha256"} of the local CSV for `difficulty`, or None when the
+    checkout has no real copy (the store then comes from the download).
+    """
+    local = os.path.join(PACKAGE_DIR, PUZZLE_SOURCES[difficulty][0])
+    if not os.path.exists(local) or _is_lfs_pointer(local):
+        return None
+    digest = hashlib.sha256()
+    with open(local, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"size": os.path.getsize(local), "sha256": digest.hexdigest()}
+
+def _source_changed(difficulty, path):
+    """
+    True if the local CSV's content differs from the one the store at
+    `path` was built from. Modification times are no guide: a checkout or
+    pull touches the CSV without changing it.
+    """
+    try:
+        with open(os.path.join(path, SOURCE_FILE), encoding="utf-8") as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return False  # built before fingerprints were recorded, or from the download
+    current = source_fingerprint(difficulty)
+    return current is not None and current != recorded
+
+def build(difficulty):
+    """(Re)builds the store for `difficulty` and returns its number of puzzles."""
+    os.makedirs(STORE_DIR, exist_ok=True)
+    source = source_fingerprint(difficulty)
+    with open_source(difficulty) as f:
+        return write_store(read_puzzle_rows(f), store_path(difficulty), source)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(difficulty):
+    """
+    Returns the process-wide PuzzleStore for `difficulty`, building it from
+    the CSV the first time (and whenever the local CSV's content changed).
+    A store validated by validate_puzzles.py is never replaced by an
+    unvalidated build; rerun validate_puzzles.py after changing the CSV.
+    """
+    with _stores_lock:
+        store = _stores.get(difficulty)
+        if store is None:
+            with store_lock():
+                store = _stores[difficulty] = _open_or_build(difficulty)
+        return store
+
+def _open_or_build(difficulty):
+    # Called under store_lock(), so a worker that waited finds the store the
+    # first one built instead of building it again
+    path = store_path(difficulty)
+    if not os.path.exists(path):
+        build(difficulty)
+    elif _source_changed(difficulty, path):
+        if os.path.exists(os.path.join(path, "solver.npy")):
+            logger.warning("%s puzzle CSV changed since %s was validated; "
+                           "run validate_puzzles.py to update it", difficulty, path)
+        else:
+            build(difficulty)
+    return PuzzleStore(path)
+
+
+if __name__ == "__main__":
+    # python puzzle_store.py build [Easy Medium Hard]
+    if sys.argv[1:2] != ["build"]:
+        sys.exit("usage: python puzzle_store.py build [difficulty ...]")
+    for difficulty in sys.argv[2:] or PUZZLE_SOURCES:
+        count = build(difficulty)
+        print(f"Stored {count} {difficulty} puzzles -> {store_path(difficulty)}")
@@ -1,45 +1,43 @@
 import streamlit as st
-import pandas as pd
 import chess
-import requests
-import io
-import chess.svg
-import base64
 import time
+import board_render
+import puzzle_store
+import service_client
 
-# Cache the CSV files to avoid redundant requests
-@st.cache_data
+# The store is built from the CSVs once and memory-mapped afterwards (or
+# lives in the analysis service when ANALYSIS_SERVICE_URL is set)
 def load_puzzles(difficulty):
-    file_map = {
-        "Easy": "https://media.githubusercontent.com/media/adityaamehra/Chess-tutor/refs/heads/main/easy.csv",
-        "Medium": "https://media.githubusercontent.com/media/adityaamehra/Chess-tutor/refs/heads/main/medium.csv",
-        "Hard": "https://media.githubusercontent.com/media/adityaamehra/Chess-tutor/refs/heads/main/hard.csv"
-    }
-    response = requests.get(file_map[difficulty])
-    if response.status_code == 200:
-        return pd.read_csv(io.StringIO(response.text))
-    else:
-        return pd.DataFrame()
+    service = service_client.get_client()
+    if service is not None:
+        return service_client.RemotePuzzleStore(service, difficulty)
+    return puzzle_store.get_store(difficulty)
 
-# Select a random puzzle
-def get_random_puzzle(df):
-    if df.empty:
-        return None, [], None
-    puzzle = df.sample().iloc[0]  # Select a random puzzle
-    moves_list = puzzle["Moves"].split()
-    return puzzle["FEN"], moves_list, puzzle["Rating"]
+# Select a random puzzle, optionally within a (low, high) rating range
+def get_random_puzzle(store, rating_range=None):
+    low, high = rating_range or (None, None)
+    puzzle = store.sample(low, high)
+    if puzzle is None:
+        return None, [], None, None
+    return puzzle.fen, puzzle.moves, puzzle.rating, puzzle.solver
 
 # Function to render the board
 def render_board(board, perspective):
-    svg = chess.svg.board(board=board, flipped=(perspective == chess.WHITE))  # Swapped perspective
-    encoded_svg = base64.b64encode(svg.encode("utf-8")).decode("utf-8")
-    return f'<img src="data:image/svg+xml;base64,{encoded_svg}" width="400"/>'
+    return board_render.board_html(
+        board, flipped=(perspective == chess.WHITE),  # Swapped perspective
+        lastmove=board_render.last_move(board),
+    )
 
 def initialize_puzzle():
     """Initialize puzzle board independently."""
-    st.session_state.puzzle_fen, st.session_state.puzzle_moves, st.session_state.puzzle_rating = get_random_puzzle(st.session_state.puzzle_data)
+    st.session_state.puzzle_fen, st.session_state.puzzle_moves, st.session_state.puzzle_rating, solver = get_random_puzzle(
+        st.session_state.puzzle_data, st.session_state.get("puzzle_rating_range")
+    )
     st.session_state.puzzle_board = chess.Board(st.session_state.puzzle_fen)
-    st.session_state.puzzle_to_move = "Black" if st.session_state.puzzle_board.turn == chess.WHITE else "White"
+    if solver is None:
+        # Not precompiled: the user plays the side that moves second
+        solver = not st.session_state.puzzle_board.turn
+    st.session_state.puzzle_to_move = "White" if solver == chess.WHITE else "Black"
     if st.session_state.puzzle_moves:
         st.session_state.puzzle_board.push_uci(st.session_state.puzzle_moves.pop(0))
 
@@ -52,9 +50,17 @@ def main():
     if "selected_difficulty" not in st.session_state or st.session_state.selected_difficulty != difficulty:
         st.session_state.selected_difficulty = difficulty
         st.session_state.puzzle_data = load_puzzles(difficulty)
+        st.session_state.puzzle_rating_range = None
         initialize_puzzle()  # Ensure a new puzzle is initialized
         st.rerun()  # Force re-run to update the board
     
+    # Optional rating range within the difficulty; applies from the next puzzle
+    bounds = st.session_state.puzzle_data.rating_bounds()
+    if bounds and bounds[0] < bounds[1]:
+        st.session_state.puzzle_rating_range = st.sidebar.slider(
+            "Rating range", bounds[0], bounds[1], bounds, key=f"rating_range_{difficulty}"
+        )
+    
     # Display puzzle rating and player to move
     st.subheader(f"Puzzle Rating: {st.session_state.puzzle_rating}")
     
@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+
+import chess
+
+import metrics
+from analysis_cache import position_key
+
+###############################################################################
+# Principal-variation reuse
+#
+# An analysis of position P at depth d with PV m1 m2 m3 ... also says what the
+# engine expects in the positions along that line: after m1 its best move is
+# m2, after m1 m2 it is m3, and so on, each backed by a search k plies
+# shallower. When the game follows the line, those positions can be answered
+# from the stored PV instead of asking the engine again.
+###############################################################################
+class PVStore:
+    """
+    Maps every position on a stored PV to the analysis the PV implies for
+    it: bestmove/ponder/continuation from the rest of the line, the same
+    evaluation, the mate count shortened by the moves already played, and
+    depth d - k. Only the deepest entry per position is kept, in an LRU of
+    `max_entries` positions.
+    """
+
+    def __init__(self, max_entries=20000, slack=2):
+        self.max_entries = max_entries
+        self.slack = slack
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def line_infos(fen, depth, info):
+        """Yields (epd, depth, info) for each position after 1, 2, ... PV moves."""
+        moves = (info.get("continuation") or "").split()
+        board = chess.Board(fen)
+        mate = info["mate"]
+        mating_side = None if mate is None else (chess.WHITE if mate > 0 else chess.BLACK)
+        for k, uci in enumerate(moves[:-1], start=1):
+            try:
+                move = chess.Move.from_uci(uci)
+            except ValueError:
+                return
+            if move not in board.legal_moves:
+                return
+            if board.turn == mating_side:
+                # One of the mating side's moves has now been played
+                mate += -1 if mate > 0 else 1
+            board.push(move)
+            if depth - k < 1 or mate == 0:
+                return
+            yield board.epd(), depth - k, {
+                "bestmove": moves[k],
+                "ponder": moves[k + 1] if k + 1 < len(moves) else None,
+                "evaluation": info["evaluation"],
+                "mate": mate,
+                "continuation": " ".join(moves[k:]),
+            }
+
+    def put(self, fen, depth, info):
+        """Stores the positions along the PV of an analysis of `fen` at `depth`."""
+        for key, line_depth, line_info in self.line_infos(fen, depth, info):
+            with self._lock:
+                current = self._entries.get(key)
+                if current is not None and current[0] >= line_depth:
+                    continue
+                self._entries[key] = (line_depth, line_info)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def get(self, fen, min_depth, max_depth=None):
+        """
+        The PV-derived analysis of `fen` if it is at least `min_depth` deep
+        (and at most `max_depth`, when given), else None.
+        """
+        key = position_key(fen)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= min_depth and (max_depth is None or entry[0] <= max_depth):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.cache_result("pv", True)
+                return dict(entry[1])
+            self.misses += 1
+        metrics.cache_result("pv", False)
+        return None
+
+    def min_depth(self, depth):
+        """The shallowest PV-derived analysis accepted for a request at `depth`."""
+        return max(1, depth - self.slack)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+###############################################################################
+# Configuration
+#
+#   PV_STORE_SIZE   positions kept from stored PVs (default 20000)
+#   PV_REUSE_SLACK  how many plies shallower than requested a PV-derived
+#                   analysis may be (default 2; 0 only reuses equal depth)
+###############################################################################
+store = PVStore(
+    max_entries=int(os.environ.get("PV_STORE_SIZE", 20000)),
+    slack=int(os.environ.get("PV_REUSE_SLACK", 2)),
+)
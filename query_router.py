@@ -0,0 +1,131 @@
+import logging
+import re
+import threading
+from collections import Counter
+
+import chess
+
+import functions
+
+logger = logging.getLogger(__name__)
+
+###############################################################################
+# Local routing for chatbot messages
+#
+# Cheap deterministic checks decide most messages on their own; only inputs
+# they cannot classify are escalated to the LLM YES/NO classifier.
+#
+# route() returns a Route with:
+#   kind     "fen", "opening", "chess" or "off_topic"
+#   path     which check decided: "fen", "opening_prefix", "index",
+#            "keyword" or "llm"
+#   payload  what the handler needs: the FEN (None if it is invalid), the
+#            opening name after an "Opening" prefix, the (eco, name, pgn)
+#            row for an index hit, or the original text
+###############################################################################
+# Words that only mean chess; one of them (or a SAN token) is enough to skip
+# the classifier
+STRONG_TERMS = {
+    "chess", "checkmate", "castling", "en passant", "middlegame",
+    "fianchetto", "zugzwang", "grandmaster", "fide", "elo", "pgn", "fen",
+    "stockfish", "discovered attack", "back rank", "en prise",
+}
+# Chess words with an everyday meaning too ("a promotion at work", "the
+# store opening", "the knight templar"); they only add to a strong signal
+WEAK_TERMS = {
+    "king", "queen", "check", "mate", "castle", "move", "moves", "fork", "pin",
+    "sacrifice", "board", "piece", "pieces", "defense", "defence", "attack",
+    "variation", "tempo", "blunder", "draw", "rating", "puzzle", "white",
+    "black", "square", "file", "rank", "diagonal", "stalemate", "gambit",
+    "opening", "endgame", "tactic", "tactics", "pawn", "pawns", "knight",
+    "knights", "bishop", "bishops", "rook", "rooks", "promotion", "skewer",
+}
+# SAN-looking tokens such as e4, Nf3, Bxe5, O-O, exd5=Q+
+SAN_TOKEN = re.compile(r"^(?:[KQRBN]?[a-h]?[1-8]?x?[a-h][1-8](?:=[QRBN])?|O-O(?:-O)?)[+#]?$")
+
+KEYWORD_THRESHOLD = 2
+
+
+class Route:
+    __slots__ = ("kind", "path", "payload")
+
+    def __init__(self, kind, path, payload=None):
+        self.kind = kind
+        self.path = path
+        self.payload = payload
+
+    def __repr__(self):
+        return f"Route(kind={self.kind!r}, path={self.path!r})"
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def route_stats():
+    """How many messages each path decided, e.g. {"fen": 3, "llm": 1}."""
+    with _stats_lock:
+        return dict(_stats)
+
+def _record(route):
+    with _stats_lock:
+        _stats[route.path] += 1
+    logger.debug("Routed message via %s as %s", route.path, route.kind)
+    return route
+
+def parse_fen(text):
+    """The normalized FEN if `text` is a valid position, else None."""
+    if "/" not in text:
+        return None
+    try:
+        board = chess.Board(text.strip())
+    except ValueError:
+        return None
+    if not board.is_valid():
+        return None
+    return board.fen()
+
+def keyword_score(text):
+    """
+    2 per STRONG_TERMS hit or SAN token, plus 1 per WEAK_TERMS hit. Weak
+    terms are everyday words too ("my king is under attack at work"), so
+    without a strong hit the score is 0 and the LLM classifier decides.
+    """
+    lowered = text.lower()
+    words = re.findall(r"[a-z]+", lowered)
+    strong = sum(1 for term in STRONG_TERMS if " " in term and term in lowered)
+    strong += sum(1 for word in words if word in STRONG_TERMS)
+    strong += sum(1 for token in text.split() if SAN_TOKEN.match(token.strip(".,!?")))
+    if not strong:
+        return 0
+    return 2 * strong + sum(1 for word in words if word in WEAK_TERMS)
+
+def route(user_input, classify=None):
+    """
+    Classifies a chatbot message. `classify` is the LLM fallback (defaults to
+    functions.normal_llm, which answers "YES" for chess-related text).
+    """
+    text = user_input.strip()
+    lowered = text.lower()
+
+    # 1) "FEN <position>" or a bare FEN
+    if re.match(r"fen\b", lowered):
+        return _record(Route("fen", "fen", parse_fen(text[3:].lstrip(" :"))))
+    fen = parse_fen(text)
+    if fen:
+        return _record(Route("fen", "fen", fen))
+
+    # 2) "Opening <name>", or a message that is just an opening name
+    if re.match(r"opening\b", lowered):
+        return _record(Route("opening", "opening_prefix", text[7:].lstrip(" :")))
+    row = functions.find(text) if len(text) < 120 else None
+    if row is not None:
+        return _record(Route("opening", "index", row))
+
+    # 3) Unmistakable chess vocabulary: sure without asking the LLM
+    if keyword_score(text) >= KEYWORD_THRESHOLD:
+        return _record(Route("chess", "keyword", text))
+
+    # 4) Truly ambiguous: ask the LLM classifier
+    classify = classify or functions.normal_llm
+    kind = "chess" if classify(text) == "YES" else "off_topic"
+    return _record(Route(kind, "llm", text))
@@ -0,0 +1,208 @@
+import argparse
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import chess
+
+import engines
+import functions
+import llm
+import metrics
+import move_features
+import puzzle_store
+import service_client
+from analysis_cache import cache as analysis_cache
+from pv_store import store as pv_store
+
+###############################################################################
+# Headless analysis service
+#
+# One warm process holds the engine pool, the opening indexes, the puzzle
+# stores, the Groq gateway and every cache; any number of Streamlit workers
+# reach it through service_client.py by setting ANALYSIS_SERVICE_URL.
+#
+#     python service.py --port 8765
+#
+# Every endpoint is a POST with a JSON object body and answers
+#     200 {"result": ...}        on success
+#     400 {"error": "..."}       for a malformed request
+#     404 {"error": "..."}       for an unknown path
+#     422 {"error": "..."}       when the analysis itself failed
+# /llm/stream answers with the completion as chunked plain text instead.
+###############################################################################
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+def _features(features):
+    return dict(features._asdict(), type_of_move=move_features.type_of_move(features))
+
+def _describe(request):
+    board = chess.Board(request["fen"])
+    return _features(move_features.describe(board, request["move"]))
+
+def _describe_moves(request):
+    board = chess.Board(request["fen"])
+    moves = request.get("moves")
+    if moves is not None:
+        moves = [chess.Move.from_uci(move) for move in moves]
+    return [_features(features) for features in move_features.describe_moves(board, moves)]
+
+def _sample_puzzle(request):
+    puzzle = puzzle_store.get_store(request["difficulty"]).sample(
+        request.get("low"), request.get("high"), request.get("theme"))
+    return None if puzzle is None else puzzle._asdict()
+
+def _stats(request):
+    return {
+        "analysis_cache": {"hits": analysis_cache.hits, "misses": analysis_cache.misses},
+        "pv_store": {"hits": pv_store.hits, "misses": pv_store.misses},
+        "llm_cache": llm.cache_stats(),
+        "llm_gateway": llm.gateway_stats(),
+        "llm_families": llm.family_stats.snapshot(),
+    }
+
+ENDPOINTS = {
+    "/info": lambda r: engines.get_info(r["fen"], int(r.get("depth", 15)), r.get("min_depth"),
+                                        bool(r.get("exact", False))),
+    "/describe": _describe,
+    "/describe_moves": _describe_moves,
+    "/openings/find": lambda r: functions.find(r["name"]),
+    "/openings/suggest": lambda r: functions.suggest_openings(r["name"], int(r.get("limit", 5))),
+    "/openings/identify": lambda r: functions.identify_opening(r["fen"]),
+    "/puzzles/bounds": lambda r: puzzle_store.get_store(r["difficulty"]).rating_bounds(),
+    "/puzzles/sample": _sample_puzzle,
+    "/llm/complete": lambda r: llm.complete(r["family"], r["system"], r["user"], r.get("model")),
+    "/explain/best_move": lambda r: functions.bm_w_exp(r["fen"]),
+    "/explain/theory": lambda r: functions.ch_comp_th(r["eco"], r["name"], r["pgn"]),
+    "/stats": _stats,
+}
+
+def _json_default(value):
+    # numpy scalars from the puzzle store
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ChessAnalysisService/1.0"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(request, dict):
+            raise ValueError("the request body must be a JSON object")
+        return request
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"result": "ok"})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path == "/llm/stream":
+            return self._stream()
+        endpoint = ENDPOINTS.get(self.path)
+        if endpoint is None:
+            return self._send_json(404, {"error": f"Unknown path {self.path}"})
+        try:
+            request = self._read_request()
+        except ValueError as e:
+            return self._send_json(400, {"error": f"Malformed request: {e}"})
+        try:
+            result = endpoint(request)
+        except KeyError as e:
+            return self._send_json(400, {"error": f"Missing field {e}"})
+        except Exception as e:
+            return self._send_json(422, {"error": f"{type(e).__name__}: {e}"})
+        self._send_json(200, {"result": result})
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self):
+        try:
+            request = self._read_request()
+            chunks = llm.stream(request["family"], request["system"], request["user"], request.get("model"))
+            # Pull the first chunk before answering, so a failed request still gets a JSON error
+            first = next(chunks, "")
+        except (ValueError, KeyError) as e:
+            return self._send_json(400, {"error": f"Malformed request: {e}"})
+        except Exception as e:
+            return self._send_json(422, {"error": f"{type(e).__name__}: {e}"})
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            if first:
+                self._write_chunk(first)
+            for chunk in chunks:
+                self._write_chunk(chunk)
+        except Exception as e:
+            # Too late for an error status: dropping the connection without the
+            # final chunk makes the client's read fail instead
+            self.log_error("stream failed: %s: %s", type(e).__name__, e)
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    """A ThreadingHTTPServer for the service (port 0 picks a free one); call serve_forever() on it."""
+    # This process answers for everyone else, so it never forwards to a service itself
+    service_client.serving = True
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve engine analysis, openings, puzzles and explanations over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="interface to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="export Prometheus metrics on this port (default: $METRICS_PORT, if set)")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.verbose)
+    started = time.perf_counter()
+    # Warm everything up front so the first page request doesn't pay for it
+    functions.initialize()
+    engines.get_backend()
+    metrics_port = metrics.start_metrics_server(args.metrics_port)
+    if metrics_port is not None:
+        print(f"Metrics on http://127.0.0.1:{metrics_port}/metrics", flush=True)
+    print(f"Warmed up in {time.perf_counter() - started:.1f} s; "
+          f"serving on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engines.close_backend()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import threading
+
+import requests
+from dotenv import load_dotenv
+
+import http_client
+from puzzle_store import Puzzle
+
+###############################################################################
+# Thin client for the analysis service (service.py)
+#
+# When ANALYSIS_SERVICE_URL is set (e.g. http://127.0.0.1:8765), engine
+# analysis, opening lookups, puzzles and LLM completions are sent to the
+# service instead of being computed in this process, so every Streamlit
+# worker shares its warm engine pool, indexes and caches.
+###############################################################################
+URL_ENV = "ANALYSIS_SERVICE_URL"
+
+
+class ServiceError(RuntimeError):
+    """The service understood the request but could not answer it."""
+
+
+class ServiceClient:
+    """
+    One method per service endpoint. Transport failures are retried by the
+    shared HTTPClient machinery; errors raised by the service itself come
+    back as ServiceError with its message.
+    """
+
+    def __init__(self, url, timeout=120, deadline=180):
+        self.url = url.rstrip("/")
+        self.deadline = deadline
+        # Explanations can take a while, so this gets its own, patient client
+        self.http = http_client.HTTPClient(timeout=timeout, deadline=deadline)
+
+    def call(self, path, **payload):
+        try:
+            return self.http.post_json(self.url + path, payload)["result"]
+        except requests.HTTPError as error:
+            try:
+                message = error.response.json()["error"]
+            except (ValueError, KeyError, TypeError):
+                raise error
+            raise ServiceError(message) from None
+
+    # -- Engine and move characterization ------------------------------------
+    def get_info(self, fen, depth=15, min_depth=None, exact=False):
+        return self.call("/info", fen=fen, depth=depth, min_depth=min_depth, exact=exact)
+
+    def describe(self, fen, move):
+        """move_features.describe() as a dict, plus its "type_of_move" text."""
+        return self.call("/describe", fen=fen, move=move)
+
+    def describe_moves(self, fen, moves=None):
+        return self.call("/describe_moves", fen=fen, moves=moves)
+
+    # -- Openings ------------------------------------------------------------
+    def find_opening(self, name):
+        found = self.call("/openings/find", name=name)
+        return tuple(found) if found else None
+
+    def suggest_openings(self, name, limit=5):
+        return [(score, tuple(row)) for score, row in self.call("/openings/suggest", name=name, limit=limit)]
+
+    def identify_opening(self, fen):
+        found = self.call("/openings/identify", fen=fen)
+        return tuple(found) if found else None
+
+    # -- Puzzles -------------------------------------------------------------
+    def puzzle_bounds(self, difficulty):
+        bounds = self.call("/puzzles/bounds", difficulty=difficulty)
+        return tuple(bounds) if bounds else None
+
+    def sample_puzzle(self, difficulty, low=None, high=None, theme=None):
+        puzzle = self.call("/puzzles/sample", difficulty=difficulty, low=low, high=high, theme=theme)
+        return Puzzle(**puzzle) if puzzle else None
+
+    # -- LLM -----------------------------------------------------------------
+    def complete(self, family, system, user, model=None):
+        return self.call("/llm/complete", family=family, system=system, user=user, model=model)
+
+    def stream(self, family, system, user, model=None):
+        """Yields the raw completion in chunks as the service relays them."""
+        payload = {"family": family, "system": system, "user": user, "model": model}
+        with self.http.session.post(self.url + "/llm/stream", json=payload, stream=True,
+                                    timeout=self.deadline) as response:
+            if response.status_code != 200:
+                try:
+                    message = response.json()["error"]
+                except (ValueError, KeyError):
+                    message = f"{response.status_code} from {response.url}"
+                raise ServiceError(message)
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+
+    def explain_best_move(self, fen):
+        return self.call("/explain/best_move", fen=fen)
+
+    def explain_theory(self, eco, name, pgn):
+        return self.call("/explain/theory", eco=eco, name=name, pgn=pgn)
+
+    def stats(self):
+        return self.call("/stats")
+
+
+class RemotePuzzleStore:
+    """The slice of puzzle_store.PuzzleStore the puzzle page uses, served by the service."""
+
+    def __init__(self, client, difficulty):
+        self.client = client
+        self.difficulty = difficulty
+        self._bounds = None
+
+    def rating_bounds(self):
+        if self._bounds is None:
+            self._bounds = self.client.puzzle_bounds(self.difficulty)
+        return self._bounds
+
+    def sample(self, low=None, high=None, theme=None):
+        return self.client.sample_puzzle(self.difficulty, low, high, theme)
+
+###############################################################################
+# Process-wide client
+###############################################################################
+_client = None
+_configured = False
+_client_lock = threading.Lock()
+
+# Set by service.py: the service itself always computes locally
+serving = False
+
+def get_client():
+    """
+    The shared ServiceClient, or None when no service is configured (or this
+    process is the service). The environment is read once, on first use.
+    """
+    global _client, _configured
+    if serving:
+        return None
+    if not _configured:
+        with _client_lock:
+            if not _configured:
+                load_dotenv()
+                url = os.environ.get(URL_ENV)
+                _client = ServiceClient(url) if url else None
+                _configured = True
+    return _client
@@ -0,0 +1,463 @@
+import random
+import sys
+import time
+
+import chess
+import chess.polyglot
+import numpy as np
+
+import metrics
+
+###############################################################################
+# Built-in search engine for the low skill levels
+#
+# A small alpha-beta searcher on top of python-chess, so a beginner's move
+# costs a few milliseconds in-process instead of a stockfish.online round
+# trip. analyse() answers with the same dictionary as every engines.py
+# backend (bestmove, ponder, evaluation, mate, continuation).
+#
+# - iterative deepening, so a node or time limit still leaves the last
+#   completed depth's answer
+# - a transposition table keyed by chess.polyglot.zobrist_hash, kept across
+#   searches (consecutive positions of a game share most of their subtrees)
+# - move ordering: table move, captures by MVV-LVA, promotions, killer
+#   moves, then quiet moves by history score
+# - quiescence search over captures at the horizon
+# - evaluation: material plus piece-square tables, tapered between the
+#   middlegame and the endgame, summed with NumPy over the piece bitboards
+###############################################################################
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0,
+}
+
+# Piece-square tables from White's side, rank 8 first as on a diagram
+# (the "simplified evaluation function" tables)
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+        0,   0,   0,   0,   0,   0,   0,   0,
+        50,  50,  50,  50,  50,  50,  50,  50,
+        10,  10,  20,  30,  30,  20,  10,  10,
+        5,   5,   10,  25,  25,  10,  5,   5,
+        0,   0,   0,   20,  20,  0,   0,   0,
+        5,   -5,  -10, 0,   0,   -10, -5,  5,
+        5,   10,  10,  -20, -20, 10,  10,  5,
+        0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0,   0,   0,   0,   -20, -40,
+        -30, 0,   10,  15,  15,  10,  0,   -30,
+        -30, 5,   15,  20,  20,  15,  5,   -30,
+        -30, 0,   15,  20,  20,  15,  0,   -30,
+        -30, 5,   10,  15,  15,  10,  5,   -30,
+        -40, -20, 0,   5,   5,   0,   -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0,   0,   0,   0,   0,   0,   -10,
+        -10, 0,   5,   10,  10,  5,   0,   -10,
+        -10, 5,   5,   10,  10,  5,   5,   -10,
+        -10, 0,   10,  10,  10,  10,  0,   -10,
+        -10, 10,  10,  10,  10,  10,  10,  -10,
+        -10, 5,   0,   0,   0,   0,   5,   -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+        0,   0,   0,   0,   0,   0,   0,   0,
+        5,   10,  10,  10,  10,  10,  10,  5,
+        -5,  0,   0,   0,   0,   0,   0,   -5,
+        -5,  0,   0,   0,   0,   0,   0,   -5,
+        -5,  0,   0,   0,   0,   0,   0,   -5,
+        -5,  0,   0,   0,   0,   0,   0,   -5,
+        -5,  0,   0,   0,   0,   0,   0,   -5,
+        0,   0,   0,   5,   5,   0,   0,   0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10, -5,  -5,  -10, -10, -20,
+        -10, 0,   0,   0,   0,   0,   0,   -10,
+        -10, 0,   5,   5,   5,   5,   0,   -10,
+        -5,  0,   5,   5,   5,   5,   0,   -5,
+        0,   0,   5,   5,   5,   5,   0,   -5,
+        -10, 5,   5,   5,   5,   5,   0,   -10,
+        -10, 0,   5,   0,   0,   0,   0,   -10,
+        -20, -10, -10, -5,  -5,  -10, -10, -20,
+    ],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20,  20,  0,   0,   0,   0,   20,  20,
+        20,  30,  10,  0,   0,   10,  30,  20,
+    ],
+}
+
+# In the endgame the king belongs in the centre
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0,   0,   -10, -20, -30,
+    -30, -10, 20,  30,  30,  20,  -10, -30,
+    -30, -10, 30,  40,  40,  30,  -10, -30,
+    -30, -10, 30,  40,  40,  30,  -10, -30,
+    -30, -10, 20,  30,  30,  20,  -10, -30,
+    -30, -30, 0,   0,   0,   0,   -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+# Game phase: 24 with all minor and major pieces on the board, 0 with none
+PHASE_WEIGHTS = {chess.KNIGHT: 1, chess.BISHOP: 1, chess.ROOK: 2, chess.QUEEN: 4}
+FULL_PHASE = 24
+
+# Row order of the (12, 64) tables: White's pieces, then Black's
+PIECE_ROWS = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+def _square_table(diagram, color):
+    """A diagram-order table as a 64-vector indexed by square (a1 = 0), for `color`."""
+    rows = np.array(diagram, dtype=np.int32).reshape(8, 8)
+    # White's a1 is the diagram's last row; Black sees the board mirrored
+    return (rows[::-1] if color == chess.WHITE else rows).reshape(64)
+
+def _build_tables(king_table):
+    table = np.empty((len(PIECE_ROWS), 64), dtype=np.int32)
+    for row, (color, piece_type) in enumerate(PIECE_ROWS):
+        diagram = king_table if piece_type == chess.KING else PIECE_SQUARE_TABLES[piece_type]
+        sign = 1 if color == chess.WHITE else -1
+        table[row] = sign * (_square_table(diagram, color) + PIECE_VALUES[piece_type])
+    return table.reshape(-1)
+
+# Flattened (12 * 64) White-minus-Black score of a piece on each square
+MIDDLEGAME = _build_tables(PIECE_SQUARE_TABLES[chess.KING])
+ENDGAME = _build_tables(KING_ENDGAME_TABLE)
+PHASE = np.array([PHASE_WEIGHTS.get(piece_type, 0) for _, piece_type in PIECE_ROWS], dtype=np.int32)
+
+def _piece_bits(board):
+    """(12, 64) array of 0/1: which squares hold each PIECE_ROWS piece."""
+    white, black = board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK]
+    # Same order as PIECE_ROWS; reading the bitboards directly beats 12 pieces_mask() calls
+    kinds = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    masks = np.array([kind & white for kind in kinds] + [kind & black for kind in kinds], dtype="<u8")
+    return np.unpackbits(masks.view(np.uint8).reshape(len(PIECE_ROWS), 8), axis=1, bitorder="little")
+
+def evaluate(board):
+    """Static evaluation in centipawns from the side to move's point of view."""
+    bits = _piece_bits(board)
+    phase = min(int(PHASE @ bits.sum(axis=1)), FULL_PHASE)
+    flat = bits.reshape(-1)
+    score = (int(MIDDLEGAME @ flat) * phase + int(ENDGAME @ flat) * (FULL_PHASE - phase)) // FULL_PHASE
+    return score if board.turn == chess.WHITE else -score
+
+###############################################################################
+# Search
+###############################################################################
+MATE = 100000
+# Scores beyond this are "mate in N plies"
+MATE_BOUND = MATE - 1000
+INFINITY = MATE + 1
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# How many nodes pass between checks of the time limit
+CHECK_EVERY = 1024
+
+# At strength 0 any root move within this many centipawns of the best may be played
+MAX_STRENGTH_MARGIN = 300
+
+
+class SearchAborted(Exception):
+    """The node or time limit ran out in the middle of an iteration."""
+
+
+class _Search:
+    """The state of one analyse() call: limits, node count and ordering heuristics."""
+
+    def __init__(self, table, node_limit, deadline):
+        self.table = table
+        self.node_limit = node_limit
+        self.deadline = deadline
+        self.nodes = 0
+        self.killers = {}
+        self.history = {}
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchAborted()
+        if self.deadline is not None and self.nodes % CHECK_EVERY == 0 and time.perf_counter() > self.deadline:
+            raise SearchAborted()
+
+    # -- Move ordering -------------------------------------------------------
+    @staticmethod
+    def _capture_order(board, move):
+        # MVV-LVA: the most valuable victim first, the cheapest attacker first among equals
+        victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+        return 10 * victim - board.piece_type_at(move.from_square)
+
+    def _ordered_moves(self, board, table_move, ply):
+        killers = self.killers.get(ply, ())
+        scored = []
+        for move in board.legal_moves:
+            if move == table_move:
+                order = 1000000
+            elif board.is_capture(move):
+                order = 100000 + self._capture_order(board, move)
+            elif move.promotion:
+                order = 90000 + move.promotion
+            elif move in killers:
+                order = 80000
+            else:
+                order = self.history.get((board.turn, move.from_square, move.to_square), 0)
+            scored.append((order, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def _remember_cutoff(self, board, move, depth, ply):
+        if board.is_capture(move) or move.promotion:
+            return
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (board.turn, move.from_square, move.to_square)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    # -- Transposition table -------------------------------------------------
+    # Mate scores are stored relative to the node, so they stay right when
+    # the same position is reached at a different ply
+    @staticmethod
+    def _to_table(score, ply):
+        if score > MATE_BOUND:
+            return score + ply
+        if score < -MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _from_table(score, ply):
+        if score > MATE_BOUND:
+            return score - ply
+        if score < -MATE_BOUND:
+            return score + ply
+        return score
+
+    # -- Alpha-beta ----------------------------------------------------------
+    def negamax(self, board, depth, alpha, beta, ply):
+        # A repetition inside the search is scored as the draw it is heading for
+        if board.halfmove_clock >= 100 or (board.halfmove_clock >= 4 and board.is_repetition(2)):
+            return 0
+        if depth <= 0:
+            return self.quiesce(board, alpha, beta)
+        self._count_node()
+
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, entry_score, flag, table_move = entry
+            if entry_depth >= depth:
+                score = self._from_table(entry_score, ply)
+                if flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha):
+                    return score
+
+        original_alpha = alpha
+        best_score, best_move = -INFINITY, None
+        for move in self._ordered_moves(board, table_move, ply):
+            board.push(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self._remember_cutoff(board, move, depth, ply)
+                break
+
+        if best_move is None:
+            # Checkmated (sooner is worse) or stalemated
+            return -(MATE - ply) if board.is_check() else 0
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, self._to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    def quiesce(self, board, alpha, beta):
+        """Plays out captures until the position is quiet, so the horizon doesn't hide a recapture."""
+        self._count_node()
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        captures = sorted(board.generate_legal_captures(),
+                          key=lambda move: self._capture_order(board, move), reverse=True)
+        for move in captures:
+            board.push(move)
+            score = -self.quiesce(board, -beta, -alpha)
+            board.pop()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def root(self, board, depth, margin):
+        """
+        [(score, move), ...] for the root moves. Moves within `margin`
+        centipawns of the best get exact scores; the rest only an upper bound.
+        """
+        entry = self.table.get(chess.polyglot.zobrist_hash(board))
+        scores = []
+        best = -INFINITY
+        for move in self._ordered_moves(board, entry[3] if entry else None, 0):
+            board.push(move)
+            floor = max(-INFINITY, best - margin)
+            score = -self.negamax(board, depth - 1, -INFINITY, -floor, 1)
+            board.pop()
+            scores.append((score, move))
+            best = max(best, score)
+        best_score, best_move = max(scores, key=lambda item: item[0])
+        self.table[chess.polyglot.zobrist_hash(board)] = (depth, best_score, EXACT, best_move)
+        return scores
+
+###############################################################################
+# Engine
+###############################################################################
+class SimpleEngine:
+    """
+    Searches to `depth` (iterative deepening) within `node_limit` nodes and
+    `time_limit` seconds; either limit can be None. The answer is the last
+    iteration that finished.
+
+    `strength` runs from 1.0 (always the best move found) down to 0.0 (any
+    move up to MAX_STRENGTH_MARGIN centipawns worse may be played, the
+    better ones more often). The transposition table is shared by every
+    search, and cleared when it grows past `table_size` entries.
+    """
+
+    def __init__(self, node_limit=50000, time_limit=1.0, strength=1.0, table_size=500000):
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.strength = strength
+        self.table_size = table_size
+        self.table = {}
+        # Nodes, depth reached and seconds of the last search
+        self.last_search = None
+
+    def margin(self, strength=None):
+        strength = self.strength if strength is None else strength
+        return round((1 - min(max(strength, 0.0), 1.0)) * MAX_STRENGTH_MARGIN)
+
+    def search(self, board, depth, strength=None, rng=None):
+        """(score in centipawns for the side to move, [move, ...] principal variation) of `board`."""
+        if board.is_game_over():
+            raise ValueError("No legal moves in this position")
+        if len(self.table) > self.table_size:
+            self.table.clear()
+        margin = self.margin(strength)
+        started = time.perf_counter()
+        deadline = started + self.time_limit if self.time_limit is not None else None
+        search = _Search(self.table, self.node_limit, deadline)
+
+        completed, reached = None, 0
+        with metrics.span("simple_engine.search", depth=depth) as span:
+            for iteration in range(1, max(depth, 1) + 1):
+                try:
+                    # An aborted iteration leaves its board mid-line, so each gets a copy
+                    completed = search.root(board.copy(), iteration, margin)
+                except SearchAborted:
+                    break
+                reached = iteration
+            span["nodes"], span["reached"] = search.nodes, reached
+        self.last_search = {"nodes": search.nodes, "depth": reached,
+                            "seconds": time.perf_counter() - started}
+
+        if completed is None:
+            # Not even depth 1 finished: play the first ordered move on its static score
+            move = search._ordered_moves(board, None, 0)[0]
+            board = board.copy(stack=False)
+            board.push(move)
+            return -evaluate(board), [move]
+        score, move = self._pick(completed, margin, rng)
+        return score, self._principal_variation(board, move, reached)
+
+    @staticmethod
+    def _pick(scores, margin, rng):
+        best = max(score for score, _ in scores)
+        if margin <= 0:
+            return max(scores, key=lambda item: item[0])
+        # Closer to the best move means more likely
+        candidates = [(score, move) for score, move in scores if score > best - margin or score == best]
+        weights = [margin - (best - score) + 1 for score, _ in candidates]
+        return (rng or random).choices(candidates, weights)[0]
+
+    def _principal_variation(self, board, move, depth):
+        """`move` followed by the table's best replies, up to `depth` plies."""
+        board = board.copy(stack=False)
+        pv = [move]
+        board.push(move)
+        while len(pv) < depth:
+            entry = self.table.get(chess.polyglot.zobrist_hash(board))
+            if entry is None or not board.is_legal(entry[3]):
+                break
+            pv.append(entry[3])
+            board.push(entry[3])
+        return pv
+
+    def analyse(self, fen, depth, strength=None, rng=None):
+        """The engines.py analysis dictionary for `fen`, with evaluation and mate from White's side."""
+        board = chess.Board(fen)
+        score, pv = self.search(board, depth, strength, rng)
+        if board.turn == chess.BLACK:
+            score = -score
+        mate = None
+        if abs(score) > MATE_BOUND:
+            plies = MATE - abs(score)
+            mate = (plies + 1) // 2 if score > 0 else -((plies + 1) // 2)
+        return {
+            "bestmove": pv[0].uci(),
+            "ponder": pv[1].uci() if len(pv) > 1 else None,
+            "evaluation": None if mate is not None else score / 100,
+            "mate": mate,
+            "continuation": " ".join(move.uci() for move in pv),
+        }
+
+###############################################################################
+# Nodes-per-second benchmark
+###############################################################################
+BENCH_POSITIONS = [
+    chess.STARTING_FEN,
+    "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+def bench(depth=4, node_limit=None, time_limit=None):
+    """Searches each BENCH_POSITIONS position from an empty table; returns (nodes, seconds)."""
+    nodes, seconds = 0, 0.0
+    for fen in BENCH_POSITIONS:
+        engine = SimpleEngine(node_limit=node_limit, time_limit=time_limit)
+        engine.analyse(fen, depth)
+        nodes += engine.last_search["nodes"]
+        seconds += engine.last_search["seconds"]
+    return nodes, seconds
+
+
+if __name__ == "__main__":
+    # python simple_engine.py bench [depth]
+    if not sys.argv[1:] or sys.argv[1] != "bench" or len(sys.argv) > 3:
+        sys.exit("usage: python simple_engine.py bench [depth]")
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    nodes, seconds = bench(depth)
+    print(f"{nodes} nodes in {seconds:.2f} s: {nodes / seconds:,.0f} nodes/s (depth {depth}, "
+          f"{len(BENCH_POSITIONS)} positions)")
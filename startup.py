@@ -0,0 +1,33 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+###############################################################################
+# Cold-start measurement per page
+#
+# main.py is re-executed by Streamlit on every rerun, so the timings live in
+# this module, which stays imported for the life of the worker process.
+###############################################################################
+_cold_starts = {}
+
+def cold_start_times():
+    """Seconds each page took to import and render for the first time in this process."""
+    return dict(_cold_starts)
+
+def run_page(page, import_page):
+    """
+    Runs `import_page()` (which imports the page module and calls its main).
+    The first run per process is the cold start and gets recorded and logged.
+    """
+    if page in _cold_starts:
+        import_page()
+        return
+    started = time.perf_counter()
+    try:
+        import_page()
+    finally:
+        # st.rerun() ends a run with an exception; the timing still counts
+        elapsed = time.perf_counter() - started
+        _cold_starts[page] = elapsed
+        logger.info("Cold start of page %r took %.3fs", page, elapsed)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tests never read or write the on-disk caches
+os.environ["ANALYSIS_CACHE_DIR"] = ""
+os.environ["LLM_CACHE_DIR"] = ""
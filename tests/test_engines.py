@@ -0,0 +1,77 @@
+"""UCIPoolBackend against the scripted engine in fake_uci_engine.py (no Stockfish needed)."""
+import os
+import signal
+import sys
+from concurrent.futures import CancelledError
+
+import chess
+import chess.engine
+import pytest
+
+import engines
+
+FAKE_ENGINE = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(engines.__file__)), "fake_uci_engine.py")]
+
+ITALIAN = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"
+
+
+@pytest.fixture
+def pool():
+    backend = engines.UCIPoolBackend(FAKE_ENGINE, pool_size=1)
+    yield backend
+    backend.close()
+
+
+def test_analyse_returns_the_backend_dictionary(pool):
+    info = pool.analyse(chess.STARTING_FEN, 5)
+    # The fake engine plays the alphabetically first legal move and scores material
+    assert info == {
+        "bestmove": "a2a3",
+        "ponder": "a7a5",
+        "evaluation": 0.0,
+        "mate": None,
+        "continuation": "a2a3 a7a5 a1a2",
+    }
+
+def test_engines_are_reused(pool):
+    pool.analyse(chess.STARTING_FEN, 5)
+    engine = pool._idle[0]
+    pool.analyse(ITALIAN, 5)
+    assert pool._idle == [engine]
+    assert pool._started == 1
+
+def test_crashed_engine_is_replaced(pool):
+    pool.warm()
+    crashed = pool._idle[0]
+    os.kill(crashed.transport.get_pid(), signal.SIGKILL)
+    # python-chess reports a dead engine either way, depending on timing
+    with pytest.raises((chess.engine.EngineTerminatedError, CancelledError)):
+        pool.analyse(chess.STARTING_FEN, 5)
+    assert pool._started == 0
+    assert pool.analyse(chess.STARTING_FEN, 5)["bestmove"] == "a2a3"
+    assert pool._idle and pool._idle[0] is not crashed
+
+def test_any_failure_returns_the_slot(pool, monkeypatch):
+    pool.warm()
+    monkeypatch.setattr(pool._idle[0], "analyse", lambda *args, **kwargs: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        pool.analyse(chess.STARTING_FEN, 5)
+    monkeypatch.undo()
+    # With pool_size=1 a leaked slot would block here forever
+    assert pool.analyse(chess.STARTING_FEN, 5)["bestmove"] == "a2a3"
+
+def test_mated_position_raises_without_leaking(pool):
+    mated = "rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3"
+    with pytest.raises(ValueError):
+        pool.analyse(mated, 5)
+    assert pool.analyse(chess.STARTING_FEN, 5)["bestmove"] == "a2a3"
+
+def test_close_quits_idle_engines(pool):
+    pool.warm()
+    engine = pool._idle[0]
+    pool.close()
+    assert pool._idle == [] and pool._started == 0
+    with pytest.raises(chess.engine.EngineTerminatedError):
+        engine.ping()
+    # The pool starts over on the next request
+    assert pool.analyse(chess.STARTING_FEN, 5)["bestmove"] == "a2a3"
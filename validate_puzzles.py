@@ -0,0 +1,141 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chess
+
+import puzzle_store
+
+###############################################################################
+# Offline validation and precompilation of the puzzle CSVs
+#
+#   python validate_puzzles.py [Easy Medium Hard] [--workers N]
+#
+# Every puzzle is replayed on a process pool. Sound puzzles are written to
+# the puzzle store together with their pre-parsed moves and the side the user
+# plays; the rest are listed with the reason in PuzzleStore/<level>_rejected.csv.
+###############################################################################
+CHUNK_SIZE = 2000
+
+def is_mate_puzzle(themes):
+    """Lichess tags mating puzzles "mate" plus "mateIn1".."mateIn5"."""
+    return any(theme == "mate" or theme.startswith("mateIn") for theme in themes.split())
+
+def check_puzzle(fen, moves, themes):
+    """
+    Replays one puzzle. Returns (solver, move codes) for a sound puzzle and
+    raises ValueError with the reason otherwise. The first move is the
+    opponent's, so the user plays the side that is *not* to move in the FEN.
+    """
+    try:
+        board = chess.Board(fen)
+    except ValueError:
+        raise ValueError("unparsable FEN")
+    if not board.is_valid():
+        raise ValueError("illegal position")
+    ucis = moves.split()
+    if len(ucis) < 2:
+        raise ValueError("fewer than two moves")
+    solver = not board.turn
+    codes = []
+    for ply, uci in enumerate(ucis, start=1):
+        try:
+            move = chess.Move.from_uci(uci)
+        except ValueError:
+            raise ValueError(f"unparsable move {ply}: {uci}")
+        if not board.is_legal(move):
+            raise ValueError(f"illegal move {ply}: {uci}")
+        board.push(move)
+        codes.append(puzzle_store.encode_move(move))
+    if is_mate_puzzle(themes) and not board.is_checkmate():
+        raise ValueError("mate theme but the line does not end in checkmate")
+    return solver, codes
+
+def validate_chunk(records):
+    """
+    Checks a list of (line, puzzle_id, fen, moves, rating, themes) records.
+    Returns (rows, rejections): store rows for the sound puzzles and
+    (line, puzzle_id, reason) for the others. Runs in the worker processes.
+    """
+    rows, rejections = [], []
+    for line, puzzle_id, fen, moves, rating, themes in records:
+        try:
+            rating = int(rating)
+        except ValueError:
+            rejections.append((line, puzzle_id, "bad rating"))
+            continue
+        try:
+            solver, codes = check_puzzle(fen, moves, themes)
+        except ValueError as e:
+            rejections.append((line, puzzle_id, str(e)))
+            continue
+        rows.append((fen, moves, rating, themes, solver, codes))
+    return rows, rejections
+
+def read_records(f):
+    # Line 1 is the header, so the first puzzle is on line 2
+    for line, row in enumerate(csv.DictReader(f), start=2):
+        yield (line, row.get("PuzzleId", ""), row["FEN"], row["Moves"],
+               row["Rating"], row.get("Themes") or "")
+
+def chunked(records, size=CHUNK_SIZE):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def report_path(difficulty):
+    return os.path.join(puzzle_store.STORE_DIR, f"{difficulty.lower()}_rejected.csv")
+
+def write_report(rejections, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Line", "PuzzleId", "Reason"])
+        writer.writerows(rejections)
+
+def compile_puzzles(difficulty, workers=None):
+    """
+    Validates every puzzle of `difficulty` across `workers` processes (all
+    cores by default), writes the precompiled store and the rejection report,
+    and returns (accepted, rejections).
+    """
+    rows, rejections = [], []
+    source = puzzle_store.source_fingerprint(difficulty)
+    with puzzle_store.open_source(difficulty) as f:
+        chunks = chunked(read_records(f))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_rows, chunk_rejections in pool.map(validate_chunk, chunks):
+                rows.extend(chunk_rows)
+                rejections.extend(chunk_rejections)
+    os.makedirs(puzzle_store.STORE_DIR, exist_ok=True)
+    puzzle_store.write_store(rows, puzzle_store.store_path(difficulty), source)
+    write_report(rejections, report_path(difficulty))
+    return len(rows), rejections
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and precompile the puzzle CSVs.")
+    parser.add_argument("difficulties", nargs="*", default=list(puzzle_store.PUZZLE_SOURCES),
+                        choices=list(puzzle_store.PUZZLE_SOURCES))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    for difficulty in args.difficulties:
+        started = time.perf_counter()
+        accepted, rejections = compile_puzzles(difficulty, args.workers)
+        print(f"{difficulty}: {accepted} puzzles stored, {len(rejections)} rejected "
+              f"({time.perf_counter() - started:.1f}s) -> {puzzle_store.store_path(difficulty)}")
+        if rejections:
+            print(f"  rejection report: {report_path(difficulty)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())